@@ -1,28 +1,29 @@
 import sys
 import os
-import shutil
-import collections # Keep for MainWindow._generate_directory_preview_summary
-from pathlib import Path # Keep for MainWindow._generate_directory_preview_summary
+import stat
+import functools
+import threading
+import collections # Directory preview summaries and the SVG preview cache
 
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-    QPushButton, QLabel, QTextEdit, QTreeView, QFileSystemModel,
+    QPushButton, QLabel, QTreeView, QFileSystemModel,
     QSplitter, QMenu, QInputDialog, QMessageBox, QComboBox,
     QHeaderView, QSpacerItem, QSizePolicy, QFileDialog, QAbstractItemView,
     QPlainTextEdit, QStackedWidget, QListWidgetItem
 )
 from PySide6.QtGui import (
-    QAction, QClipboard, QCursor, QGuiApplication, QPalette, QColor, QIcon,
-    QPixmap, QPainter, QFont, QTextOption
+    QGuiApplication, QPalette, QColor, QIcon,
+    QPixmap, QPainter, QFont, QImageReader
 )
 from PySide6.QtCore import (
     Qt, QDir, Slot, QTimer, Signal, QModelIndex, QPoint,
-    QRect, QSize, QRectF
+    QSize, QRectF, QFile, QIODevice, QRunnable, QThreadPool, QObject,
+    QSignalBlocker
 )
 
 import db_manager
 from hover_icon import HoverIcon
-from syntax_highlighter import SyntaxHighlighter
 import context_generator
 
 # Import the new UI components module
@@ -39,6 +40,17 @@ except ImportError:
           "SVG preview will not be available. "
           "Install PySide6-Addons or ensure Qt SVG module is available.")
 
+# Compiled Qt resources (generated from resources.qrc by make.bat).
+# When running from source without the generated module, files are loaded from disk.
+try:
+    import resources_rc # Registers the embedded resources on import
+    APP_ICON_PATH = ":/icons/contextdropper.png"
+    DARK_STYLE_SHEET_PATH = ":/styles/dark.qss"
+except ImportError:
+    _MODULE_DIR = os.path.dirname(os.path.abspath(__file__)) # Not the working directory, which may be anywhere
+    APP_ICON_PATH = os.path.join(_MODULE_DIR, "contextdropper.png")
+    DARK_STYLE_SHEET_PATH = os.path.join(_MODULE_DIR, "styles", "dark.qss")
+
 
 # --- Constants for App Settings Keys ---
 GUI_POS_X_KEY = 'gui_pos_x'
@@ -47,6 +59,237 @@ HOVER_POS_X_KEY = 'hover_pos_x'
 HOVER_POS_Y_KEY = 'hover_pos_y'
 LAST_UI_MODE_KEY = 'last_ui_mode'
 
+# --- Preview Pane Colors and Font (applied once in setup_ui) ---
+# Set through QPalette/QFont rather than per-widget stylesheets, which Qt re-resolves on every polish.
+# The global stylesheet is kept to the tooltip rule in styles/dark.qss; style components through palettes.
+_PREVIEW_BACKGROUND = QColor("#1E1E1E")
+PREVIEW_PALETTE_COLORS = (
+    (QPalette.Base, _PREVIEW_BACKGROUND), # Text preview background
+    (QPalette.Window, _PREVIEW_BACKGROUND), # Image preview background
+    (QPalette.Text, QColor("#D4D4D4")),
+    (QPalette.Highlight, QColor("#0078D7")),
+    (QPalette.HighlightedText, QColor("#FFFFFF")),
+    (QPalette.PlaceholderText, QColor("#A0A0A0")),
+)
+PREVIEW_FONT_FAMILIES = ['Consolas', 'Monaco', 'Menlo', 'Courier New']
+PREVIEW_FONT_POINT_SIZE = 9
+# Rich text for the no-project page; the link uses a blue that reads well on the fixed dark theme
+NO_PROJECT_PLACEHOLDER_HTML = (
+    '<span style="color: #A0A0A0; font-weight: bold;">Create a '
+    '<a href="action:new_project" style="color: #569CD6; text-decoration: underline; font-weight: bold;">new project</a>'
+    ' or select an existing one to get started.</span>'
+)
+
+@functools.lru_cache(maxsize=8192)
+def _norm(path):
+    """Normalizes and normcases a path; memoized because the same paths recur on every repaint/refresh."""
+    return os.path.normcase(os.path.normpath(path))
+
+_normcase = os.path.normcase # Module-level alias for the per-file hot loops below
+
+_TREE_IGNORED_NAMES = context_generator.TREE_IGNORED_NAME_SET # Directory names never descended into
+_iter_project_files = context_generator.iter_project_files
+_parse_file_types = context_generator.parse_file_types
+
+def _selection_display_text(sel, project_path, project_prefix):
+    """
+    Builds the selected-items list label for a selection row.
+    Args:
+        sel: Selection row with normcased 'path', 'is_directory', 'file_types' and 'category_name'.
+        project_path (str): Normcased project path, or None if there is no valid project directory.
+        project_prefix (str): project_path followed by os.sep.
+    Returns:
+        str: The display text, e.g. "src/ (Dir: .py)  [Backend]".
+    """
+    sel_path = sel['path']
+    # Determine how to display the path (relative, external, etc.)
+    if project_path is not None:
+        if sel_path == project_path:
+            display_path = "."
+        elif sel_path.startswith(project_prefix):
+            # Both paths are normalized, so stripping the prefix equals os.path.relpath
+            display_path = sel_path[len(project_prefix):]
+        else: # Path is outside the current project tree structure
+            display_path = f"{os.path.basename(sel_path)} (External to current project tree)"
+    elif sel_path == os.path.basename(sel_path): # e.g. "file.txt" (already just a name)
+        display_path = sel_path
+    else: # e.g. "/abs/path/to/file.txt" or "rel/path/file.txt"
+        display_path = f"{sel_path} (Full Path)"
+
+    if sel['is_directory']:
+        file_types_display = sel['file_types'] if sel['file_types'] else "ALL"
+        if display_path == ".": # Project root selected as directory
+            display_text = f". (Dir: {file_types_display})"
+        else:
+            display_text = f"{display_path}{os.sep} (Dir: {file_types_display})"
+    else: # It's a file
+        display_text = display_path
+
+    if sel['category_name']:
+        display_text += f"  [{sel['category_name']}]"
+    return display_text
+
+# --- Dark Theme ---
+# Shared colors, constructed once and referenced by the palette spec below
+_DARK_GRAY = QColor(53, 53, 53)
+_DARKER_GRAY = QColor(35, 35, 35)
+_ACCENT_BLUE = QColor(42, 130, 218)
+_PLACEHOLDER_GRAY = QColor(128, 128, 128)
+
+# (color role, color) pairs consumed by dark_palette()
+DARK_PALETTE_COLORS = (
+    (QPalette.Window, _DARK_GRAY),
+    (QPalette.WindowText, Qt.white),
+    (QPalette.Base, _DARKER_GRAY), # Text edit backgrounds
+    (QPalette.AlternateBase, _DARK_GRAY), # List alternate rows
+    (QPalette.ToolTipBase, Qt.white),
+    (QPalette.ToolTipText, Qt.black),
+    (QPalette.Text, Qt.white),
+    (QPalette.Button, _DARK_GRAY),
+    (QPalette.ButtonText, Qt.white),
+    (QPalette.BrightText, Qt.red),
+    (QPalette.Link, _ACCENT_BLUE), # Blue for links
+    (QPalette.Highlight, _ACCENT_BLUE), # Selection highlight
+    (QPalette.HighlightedText, Qt.black), # Text in selection
+    (QPalette.PlaceholderText, _PLACEHOLDER_GRAY), # Placeholder text color
+)
+
+@functools.lru_cache(maxsize=1)
+def dark_palette():
+    """
+    Returns the application's dark QPalette built from DARK_PALETTE_COLORS.
+    Built on first use (after the QApplication exists) and shared afterwards; QPalette is implicitly shared when applied.
+    """
+    palette = QPalette()
+    for role, color in DARK_PALETTE_COLORS:
+        palette.setColor(role, color)
+    return palette
+
+class _WritePromptTask(QRunnable):
+    """
+    Persists prompt guides on a QThreadPool worker so typing never waits on the database.
+    Only the newest unsaved text per project is kept; older pending writes are dropped.
+    """
+    _pending = {} # {project_id: newest unsaved prompt text}
+    _pending_lock = threading.Lock()
+
+    @classmethod
+    def submit(cls, pool, project_id, prompt_text):
+        """Queues a write on pool, which must be single-threaded so writes land in submission order."""
+        with cls._pending_lock:
+            already_queued = bool(cls._pending) # A queued task will pick up this text too
+            cls._pending[project_id] = prompt_text
+        if not already_queued:
+            pool.start(cls())
+
+    def run(self):
+        with _WritePromptTask._pending_lock:
+            pending = _WritePromptTask._pending
+            _WritePromptTask._pending = {}
+        for project_id, prompt_text in pending.items():
+            db_manager.update_project_prompt(project_id, prompt_text)
+
+
+class _InclusionMapSignals(QObject):
+    finished = Signal(int, object, object) # (request id, frozenset of normcased file paths, directory contributions)
+
+
+class _InclusionMapTask(QRunnable):
+    """
+    Builds the set of files marked for inclusion on a QThreadPool worker,
+    so walking selected directories never blocks painting the tree.
+    """
+    def __init__(self, request_id, effective_selections, directory_contributions, build_inclusion_map, signals):
+        super().__init__()
+        self.request_id = request_id
+        self.effective_selections = effective_selections # Captured on the GUI thread
+        self.directory_contributions = directory_contributions # A copy; the task never touches the window's cache
+        self.build_inclusion_map = build_inclusion_map
+        self.signals = signals
+
+    def run(self):
+        try:
+            included_files, contributions = self.build_inclusion_map(self.effective_selections,
+                                                                     self.directory_contributions)
+            # Interned, like the paths cached by data(), so membership tests match on identity
+            included_paths = frozenset(map(sys.intern, included_files))
+        except Exception as e:
+            print(f"Error building inclusion map: {e}")
+            included_paths, contributions = frozenset(), None
+        self.signals.finished.emit(self.request_id, included_paths, contributions) # Queued to the GUI thread
+
+
+class _PreviewLoadSignals(QObject):
+    finished = Signal(int, object, bool, str) # (request id, (path, ext, cache key), is message only, text)
+
+
+class _PreviewLoadTask(QRunnable):
+    """
+    Reads a text file or summarizes a directory for the preview pane on a QThreadPool worker,
+    so slow disks and network shares never block the window.
+    """
+    def __init__(self, request_id, load, context, signals):
+        super().__init__()
+        self.request_id = request_id
+        self.load = load # Returns (is_message_only, text)
+        self.context = context
+        self.signals = signals
+
+    def run(self):
+        try:
+            is_message_only, text = self.load()
+        except Exception as e:
+            is_message_only, text = True, f"Error loading preview: {e}"
+        self.signals.finished.emit(self.request_id, self.context, is_message_only, text) # Queued to the GUI thread
+
+
+class _DropContextSignals(QObject):
+    finished = Signal(str, object) # (context file path, (error title, message) or None)
+
+
+class _DropContextTask(QRunnable):
+    """
+    Generates and writes the context file on a QThreadPool worker,
+    so large projects do not freeze the window while the file is built.
+    """
+    def __init__(self, project_path, selections, binary_like_extensions, context_file_leaf_name, signals):
+        super().__init__()
+        self.project_path = project_path
+        self.selections = selections # Captured on the GUI thread
+        self.binary_like_extensions = binary_like_extensions
+        self.context_file_leaf_name = context_file_leaf_name
+        self.signals = signals
+
+    def run(self):
+        context_file_full_path = os.path.join(self.project_path, self.context_file_leaf_name)
+        try:
+            context_lines = context_generator.generate_context_file_data(
+                self.project_path,       # Original case project path for display in context.txt
+                self.selections,         # Paths in selections are normcased
+                self.binary_like_extensions,
+                self.context_file_leaf_name
+            )
+        except Exception as e:
+            print(f"Context generation error: {e}")
+            self.signals.finished.emit(context_file_full_path, (
+                "Context Generation Error", f"An error occurred while generating the context data: {e}"))
+            return
+        try:
+            # Streamed through a large buffer instead of joining one multi-MB string first; same output as "\n".join()
+            with open(context_file_full_path, 'w', encoding='utf-8', buffering=1 << 20) as f:
+                lines_iter = iter(context_lines)
+                first_line = next(lines_iter, None)
+                if first_line is not None:
+                    f.write(first_line)
+                    f.writelines("\n" + line for line in lines_iter)
+        except Exception as e:
+            print(f"Error saving '{self.context_file_leaf_name}': {e}")
+            self.signals.finished.emit(context_file_full_path, (
+                "Error Saving Context File", f"Could not save '{self.context_file_leaf_name}': {e}"))
+            return
+        self.signals.finished.emit(context_file_full_path, None) # Queued to the GUI thread
+
+
 class ContextStatusFileSystemModel(QFileSystemModel):
     """
     Custom QFileSystemModel to display an asterisk (*) next to files
@@ -55,40 +298,114 @@ class ContextStatusFileSystemModel(QFileSystemModel):
     def __init__(self, main_window, parent=None):
         super().__init__(parent)
         self.main_window = main_window
-        self._cached_selection_details = {} # Stores {normcased_abs_file_path: True}
+        self._cached_selection_details = frozenset() # normcased_abs_file_paths marked for inclusion
+        self._normpath_cache = {} # Stores {index.internalId(): normcased_abs_file_path}
+        self._indicators_active = False # True while rooted at a project directory; see setRootPath
+        # internalId() is the address of a file node; drop cached paths whenever nodes may be freed or renamed
+        self.rowsAboutToBeRemoved.connect(self._clear_normpath_cache)
+        self.modelAboutToBeReset.connect(self._clear_normpath_cache)
+        self.fileRenamed.connect(self._clear_normpath_cache)
+        # Coalesces bursts of refresh requests (e.g. batch selection changes) into one repaint
+        self._refresh_timer = QTimer(self)
+        self._refresh_timer.setSingleShot(True)
+        self._refresh_timer.setInterval(16) # ~one frame
+        self._refresh_timer.timeout.connect(self._start_inclusion_map_job)
+        # Inclusion maps are built in the background; results for superseded requests are dropped
+        self._inclusion_request_id = 0
+        self._inclusion_contributions_generation = 0 # MainWindow._contributions_generation the running job started from
+        self._inclusion_signals = _InclusionMapSignals(self)
+        self._inclusion_signals.finished.connect(self._on_inclusion_map_ready)
+
+    def _clear_normpath_cache(self, *args):
+        self._normpath_cache.clear()
+
+    def setRootPath(self, path):
+        # The window only roots the tree at a directory while a project is active, and at "" otherwise,
+        # so data() can tell whether asterisks apply from this one flag
+        self._indicators_active = bool(path) and self.main_window is not None
+        return super().setRootPath(path)
 
     def data(self, index, role=Qt.DisplayRole):
         """
         Overrides the data method to modify the display name of files.
         """
-        if role == Qt.DisplayRole and index.isValid():
-            original_name = super().data(index, role)
-            # Return original name if root path is empty (no project selected)
-            if not self.rootPath(): # Check if root path is empty
-                 return original_name
-
-            file_path_abs = self.filePath(index)
-            normcased_file_path_from_model = os.path.normcase(os.path.normpath(file_path_abs))
-
-            if not self.isDir(index) and self.main_window and self.main_window.current_project_id:
-                if self.main_window._selections_for_display_dirty:
-                    effective_selections = self.main_window.get_effective_selections_for_display()
-                    self._cached_selection_details = self.main_window.get_detailed_inclusion_map(effective_selections)
-                    self.main_window._selections_for_display_dirty = False
-
-                if normcased_file_path_from_model in self._cached_selection_details:
-                    return f"{original_name} *"
+        if role != Qt.DisplayRole or not index.isValid():
+            return super().data(index, role)
+
+        original_name = super().data(index, role)
+        # Directories, and every row while no project is active (empty root path), never get an asterisk
+        if not self._indicators_active or self.isDir(index):
             return original_name
-        return super().data(index, role)
+        main_window = self.main_window
+
+        node_id = index.internalId()
+        normcased_file_path_from_model = self._normpath_cache.get(node_id)
+        if normcased_file_path_from_model is None:
+            normcased_file_path_from_model = sys.intern(_norm(self.filePath(index)))
+            self._normpath_cache[node_id] = normcased_file_path_from_model
+
+        if main_window._selections_for_display_dirty and not self._refresh_timer.isActive():
+            self._refresh_timer.start() # Keep serving the previous set until the new one is ready
+
+        if normcased_file_path_from_model in self._cached_selection_details:
+            return f"{original_name} *"
+        return original_name
 
     def refresh_display_indicators(self):
-        if self.main_window:
-            self.main_window._selections_for_display_dirty = True
-        self.layoutChanged.emit()
+        self._normpath_cache.clear()
+        if self.main_window and self.main_window._selections_for_display_dirty:
+            self._refresh_timer.start()
+        # Otherwise the inclusion map built for the current selections is still valid
+
+    def _start_inclusion_map_job(self):
+        main_window = self.main_window
+        if not main_window or not main_window._selections_for_display_dirty:
+            return
+        main_window._selections_for_display_dirty = False
+        self._inclusion_request_id += 1
+        self._inclusion_contributions_generation = main_window._contributions_generation
+        task = _InclusionMapTask(self._inclusion_request_id,
+                                 main_window.get_effective_selections_for_display(),
+                                 dict(main_window._directory_contributions),
+                                 main_window.get_detailed_inclusion_map,
+                                 self._inclusion_signals)
+        QThreadPool.globalInstance().start(task)
+
+    def _on_inclusion_map_ready(self, request_id, included_paths, contributions):
+        if request_id != self._inclusion_request_id:
+            return # A newer request is in flight
+        if contributions is not None:
+            self.main_window._store_directory_contributions(contributions, self._inclusion_contributions_generation)
+        self._cached_selection_details = included_paths
+        self._emit_visible_display_changes()
+
+    def _emit_visible_display_changes(self):
+        """
+        Emits dataChanged for the rows currently visible in the tree view only.
+        Rows scrolled out of view call data() again when painted, so they need no notification.
+        """
+        view = self.main_window.tree_view if self.main_window else None
+        if view is None:
+            return
+        viewport_rect = view.viewport().rect()
+        index = view.indexAt(viewport_rect.topLeft()).siblingAtColumn(0) # Only the name column shows the asterisk
+        run_parent, run_first, run_last = None, None, None
+        while index.isValid() and view.visualRect(index).top() <= viewport_rect.bottom():
+            parent = index.parent()
+            if run_first is not None and parent == run_parent and index.row() == run_last.row() + 1:
+                run_last = index
+            else: # New run of consecutive sibling rows
+                if run_first is not None:
+                    self.dataChanged.emit(run_first, run_last, [Qt.DisplayRole])
+                run_parent, run_first, run_last = parent, index, index
+            index = view.indexBelow(index)
+        if run_first is not None:
+            self.dataChanged.emit(run_first, run_last, [Qt.DisplayRole])
 
 
 class MainWindow(QMainWindow):
-    BINARY_EXTENSIONS = [
+    # Lowercase keys; compare against lowercased extensions
+    BINARY_EXTENSIONS = frozenset({
         '.exe', '.dll', '.so', '.dylib', '.jar', '.class', '.pyc', '.o', '.a', '.lib',
         '.zip', '.gz', '.tar', '.rar', '.7z', '.pkg', '.dmg',
         '.pdf', '.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx',
@@ -96,11 +413,26 @@ class MainWindow(QMainWindow):
         '.mp3', '.wav', '.ogg', '.mp4', '.avi', '.mkv', '.mov', '.webm',
         '.db', '.sqlite', '.sqlite3', '.mdb', '.accdb',
         '.wasm', '.woff', '.woff2', '.ttf', '.otf', '.eot',
-        '.DS_Store'
-    ]
+        '.ds_store'
+    })
     MAX_PREVIEW_SIZE = 1 * 1024 * 1024
-    RASTER_IMAGE_EXTENSIONS = ['.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tiff', '.ico']
-    SVG_IMAGE_EXTENSIONS = ['.svg']
+    RASTER_IMAGE_EXTENSIONS = frozenset({'.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tiff', '.ico'})
+    SVG_IMAGE_EXTENSIONS = frozenset({'.svg'})
+    # Everything the context generator skips as binary; a tuple so it can go straight to str.endswith()
+    BINARY_LIKE_EXTENSIONS = tuple(sorted(BINARY_EXTENSIONS | RASTER_IMAGE_EXTENSIONS | SVG_IMAGE_EXTENSIONS))
+    IMAGE_PIXMAP_CACHE_SIZE = 16 # Decoded/rendered image previews kept for repeated clicks
+    PREVIEW_TEXT_CACHE_SIZE = 32 # Text previews kept for repeated clicks
+    # Add more as needed, ensure they match SyntaxHighlighter keys
+    SYNTAX_HIGHLIGHT_EXTENSIONS = frozenset({
+        '.py', '.js', '.dart', '.html', '.htm', '.yaml', '.json', '.txt', '.md',
+        '.java', '.cs', '.cpp', '.c', '.h', '.hpp', '.go', '.php', '.rb', '.swift', '.kt', '.rs'
+    })
+    # Known text formats: previewed without opening the file to sniff for null bytes
+    TEXT_EXTENSIONS = frozenset({
+        '.py', '.js', '.ts', '.dart', '.html', '.htm', '.css', '.yaml', '.yml', '.json', '.toml',
+        '.ini', '.cfg', '.txt', '.md', '.rst', '.csv', '.xml', '.sh', '.bat', '.sql',
+        '.java', '.cs', '.cpp', '.c', '.h', '.hpp', '.go', '.php', '.rb', '.swift', '.kt', '.rs'
+    })
 
     def __init__(self):
         super().__init__()
@@ -108,26 +440,73 @@ class MainWindow(QMainWindow):
         self.setGeometry(100, 100, 1200, 800)
         self.current_project_id = None
         self.current_project_path = None
-        self.current_highlighter = None
+        self._project_path_with_sep = None # current_project_path + separator, for ancestor checks
+        self.current_highlighter = None # Created on the first highlighted preview, then reused
         self._selections_for_display_dirty = True
-        db_manager.init_db()
+        self._effective_selections_cache = None # Selections under the export filter; None when stale
+        # {(dir path, file_types): frozenset of included files}; lets a rebuild walk only new or edited directory selections
+        self._directory_contributions = {}
+        self._contributions_generation = 0 # Bumped on invalidation; results of walks started before it are not cached
+        self._selection_by_path = {} # {normcased path: selection row} for the active project
+        self._categories_cache = [] # Categories of the active project, reloaded by load_categories_for_export
+        self._categories_dialog = None # ManageCategoriesDialog, created on first use
+        self._expanded_paths_by_project = {} # {project_id: set of expanded directory paths}, kept for this session
+        self.hover_widget = None # Created after the main UI is built
+        self.notification_widget = None
+        # App settings written by the window are batched and flushed together after a short idle period
+        self._pending_settings = {}
+        self._stored_settings = {} # Settings already read from or written to the database, by key
+        self._settings_flush_timer = QTimer(self)
+        self._settings_flush_timer.setSingleShot(True)
+        self._settings_flush_timer.setInterval(500) # ms delay
+        self._settings_flush_timer.timeout.connect(self._flush_settings)
+        # Coalesces previews while the selection moves quickly (e.g. arrowing through the tree)
+        self._pending_preview_path = None
+        self._preview_timer = QTimer(self)
+        self._preview_timer.setSingleShot(True)
+        self._preview_timer.setInterval(120) # ms delay
+        self._preview_timer.timeout.connect(self._show_pending_preview)
+        self._app = QApplication.instance() # Looked up once; used to quit on close
+        self._deferred_tree_root = None # Project directory to show in the tree once the window becomes visible
+        self._last_preview_key = None # (path, mtime_ns, size, width, height) of the file on display, if any
+        # Text and directory previews load on a worker; results for superseded requests are dropped
+        self._preview_request_id = 0
+        self._preview_signals = _PreviewLoadSignals(self)
+        self._preview_signals.finished.connect(self._on_preview_loaded)
+        self._preview_text_cache = collections.OrderedDict() # {(path, mtime_ns, size): (is_message_only, text)}, LRU order
+        self._image_pixmap_cache = collections.OrderedDict() # {(path, mtime_ns, width, height): QPixmap}, LRU order
+        # Context files are generated off the GUI thread; only one drop runs at a time
+        self._drop_in_progress = False
+        self._drop_anchor_widget = None
+        self._drop_signals = _DropContextSignals(self)
+        self._drop_signals.finished.connect(self._on_context_dropped)
+        # Prompt writes get their own single-thread pool: closeEvent waits for them, not for tree walks or drops
+        self._prompt_write_pool = QThreadPool(self)
+        self._prompt_write_pool.setMaxThreadCount(1)
+        db_manager.init_db() # Ensure the database exists and its schema is up-to-date; safe to call repeatedly
         self.setup_ui()
         self.hover_widget = HoverIcon()
         self._load_initial_positions()
-        self.load_projects()
-        self.load_active_project() # This will call update_ui_for_project_state
         self.hover_widget.drop_context_requested.connect(self.drop_context)
         self.hover_widget.maximize_requested.connect(self.show_main_window_from_hover)
         self.hover_widget.close_application_requested.connect(self.close_application_from_hover)
-        self.notification_widget = NotificationWidget()
+        self.hover_widget.position_changed.connect(self.save_hover_icon_position)
         self.prompt_save_timer = QTimer(self)
         self.prompt_save_timer.setSingleShot(True)
         self.prompt_save_timer.timeout.connect(self.save_prompt_guide_to_db)
         self.prompt_edit.textChanged.connect(self.on_prompt_text_changed)
         self.initial_mode = "gui"
-        last_mode_setting = db_manager.get_app_setting(LAST_UI_MODE_KEY)
+        last_mode_setting = self._get_app_setting(LAST_UI_MODE_KEY)
         if last_mode_setting == "hover":
             self.initial_mode = "hover"
+        # Project loading and the notification widget are set up by _finish_async_init(),
+        # scheduled once the event loop is running so the first window appears sooner.
+
+    def _finish_async_init(self):
+        """Completes startup work deferred until after the first window is shown."""
+        self.load_projects()
+        self.load_active_project() # This will call update_ui_for_project_state
+        self.notification_widget = NotificationWidget()
 
     def _center_on_primary_screen(self):
         primary_screen = QGuiApplication.primaryScreen()
@@ -157,8 +536,8 @@ class MainWindow(QMainWindow):
     def _load_initial_positions(self):
         gui_loaded = False
         try:
-            gui_x_str = db_manager.get_app_setting(GUI_POS_X_KEY)
-            gui_y_str = db_manager.get_app_setting(GUI_POS_Y_KEY)
+            gui_x_str = self._get_app_setting(GUI_POS_X_KEY)
+            gui_y_str = self._get_app_setting(GUI_POS_Y_KEY)
             if gui_x_str is not None and gui_y_str is not None:
                 self.move(QPoint(int(gui_x_str), int(gui_y_str)))
                 gui_loaded = True
@@ -173,8 +552,8 @@ class MainWindow(QMainWindow):
         hover_loaded = False
         if self.hover_widget:
             try:
-                hover_x_str = db_manager.get_app_setting(HOVER_POS_X_KEY)
-                hover_y_str = db_manager.get_app_setting(HOVER_POS_Y_KEY)
+                hover_x_str = self._get_app_setting(HOVER_POS_X_KEY)
+                hover_y_str = self._get_app_setting(HOVER_POS_Y_KEY)
                 if hover_x_str is not None and hover_y_str is not None:
                     self.hover_widget.move(QPoint(int(hover_x_str), int(hover_y_str)))
                     hover_loaded = True
@@ -185,17 +564,39 @@ class MainWindow(QMainWindow):
             if not hover_loaded:
                 self._center_hover_icon_on_primary_screen()
 
+    def _queue_app_setting(self, key, value):
+        self._pending_settings[key] = value
+        self._settings_flush_timer.start()
+
+    def _get_app_setting(self, key):
+        """
+        Reads a setting, preferring a value that is queued but not yet flushed.
+        Each key is read from the database at most once; later reads come from memory.
+        """
+        if key in self._pending_settings:
+            return self._pending_settings[key]
+        if key not in self._stored_settings:
+            self._stored_settings[key] = db_manager.get_app_setting(key)
+        return self._stored_settings[key]
+
+    def _flush_settings(self):
+        self._settings_flush_timer.stop()
+        if self._pending_settings:
+            db_manager.set_app_settings(self._pending_settings)
+            self._stored_settings.update(self._pending_settings)
+            self._pending_settings = {}
+
     def save_gui_position(self):
         if self.isVisible() and not self.isMinimized():
             current_pos = self.pos()
-            db_manager.set_app_setting(GUI_POS_X_KEY, str(current_pos.x()))
-            db_manager.set_app_setting(GUI_POS_Y_KEY, str(current_pos.y()))
+            self._queue_app_setting(GUI_POS_X_KEY, str(current_pos.x()))
+            self._queue_app_setting(GUI_POS_Y_KEY, str(current_pos.y()))
 
     def save_hover_icon_position(self):
         if self.hover_widget:
             current_pos = self.hover_widget.pos()
-            db_manager.set_app_setting(HOVER_POS_X_KEY, str(current_pos.x()))
-            db_manager.set_app_setting(HOVER_POS_Y_KEY, str(current_pos.y()))
+            self._queue_app_setting(HOVER_POS_X_KEY, str(current_pos.x()))
+            self._queue_app_setting(HOVER_POS_Y_KEY, str(current_pos.y()))
 
     def setup_ui(self):
         main_widget = QWidget()
@@ -236,21 +637,37 @@ class MainWindow(QMainWindow):
         self.fs_model = ContextStatusFileSystemModel(self)
         self.fs_model.setRootPath("")
         self.fs_model.setFilter(QDir.AllDirs | QDir.Files | QDir.NoDotAndDotDot)
+        # Files created or deleted on disk show up as row changes in watched directories.
+        # A directory's first fill on expand also inserts rows; those come before its directoryLoaded.
+        self._loaded_tree_dirs = set() # Normcased directories whose initial listing has finished
+        self.fs_model.directoryLoaded.connect(self._on_tree_directory_loaded)
+        self.fs_model.rowsInserted.connect(self._on_tree_rows_changed)
+        self.fs_model.rowsRemoved.connect(self._on_tree_rows_changed)
+        # Plain folder icons; skips the per-directory custom icon lookup (desktop.ini etc.) the gatherer does
+        self.fs_model.setOption(QFileSystemModel.DontUseCustomDirectoryIcons, True)
         self.tree_view = QTreeView()
+        self.tree_view.setUniformRowHeights(True) # All rows share one font/icon size; skips per-row size hints
         self.tree_view.setModel(self.fs_model)
         self.tree_view.setRootIndex(self.fs_model.index(""))
+        # Set the sort order first: enabling sorting sorts by the header's indicator,
+        # so a separate sortByColumn() call would sort the model a second time
+        self.tree_view.header().setSortIndicator(0, Qt.AscendingOrder)
         self.tree_view.setSortingEnabled(True)
-        self.tree_view.sortByColumn(0, Qt.AscendingOrder)
         self.tree_view.setDragEnabled(True)
         self.tree_view.setDragDropMode(QAbstractItemView.DragOnly)
         self.tree_view.setSelectionMode(QAbstractItemView.ExtendedSelection)
         self.tree_view.setHeaderHidden(False)
         self.tree_view.setContextMenuPolicy(Qt.CustomContextMenu)
         self.tree_view.customContextMenuRequested.connect(self.tree_context_menu)
-        for i in range(1, self.fs_model.columnCount()):
-            self.tree_view.setColumnHidden(i, True)
-        self.tree_view.header().setSectionResizeMode(0, QHeaderView.Stretch)
+        # Only the name column is shown; QFileSystemModel's column set is fixed, so hide the rest once
+        tree_header = self.tree_view.header()
+        tree_header.setStretchLastSection(False) # Name column stretches instead of the hidden last one
+        for section in range(1, tree_header.count()):
+            tree_header.hideSection(section)
+        tree_header.setSectionResizeMode(0, QHeaderView.Stretch)
         self.tree_view.selectionModel().currentChanged.connect(self._handle_tree_view_selection)
+        self.tree_view.expanded.connect(self._on_tree_expanded)
+        self.tree_view.collapsed.connect(self._on_tree_collapsed)
         left_layout.addWidget(self.tree_view)
         splitter.addWidget(left_pane)
 
@@ -263,7 +680,7 @@ class MainWindow(QMainWindow):
         prompt_layout = QVBoxLayout(prompt_group)
         prompt_layout.setContentsMargins(0,0,0,0)
         prompt_layout.addWidget(QLabel("AI Prompt Guide:"))
-        self.prompt_edit = QTextEdit()
+        self.prompt_edit = QPlainTextEdit() # Plain-text layout; the prompt guide is never rich text
         self.prompt_edit.setPlaceholderText("Enter your initial prompt guide here...")
         prompt_layout.addWidget(self.prompt_edit)
         self.right_splitter.addWidget(prompt_group)
@@ -274,21 +691,22 @@ class MainWindow(QMainWindow):
         self.preview_title_label = QLabel("File Preview:") # Instance variable
         preview_layout.addWidget(self.preview_title_label)
         self.preview_stack = QStackedWidget()
+        preview_palette = self.preview_stack.palette() # Dark app palette with the preview colors on top
+        for role, color in PREVIEW_PALETTE_COLORS:
+            preview_palette.setColor(role, color)
+        preview_font = QFont()
+        preview_font.setFamilies(PREVIEW_FONT_FAMILIES)
+        preview_font.setStyleHint(QFont.Monospace) # Any monospace font if none of the families is installed
+        preview_font.setPointSize(PREVIEW_FONT_POINT_SIZE)
         self.file_preview_edit = QPlainTextEdit()
         self.file_preview_edit.setReadOnly(True)
-        self.file_preview_edit.setStyleSheet(
-            "QPlainTextEdit { background-color: #1E1E1E; "
-"color: #D4D4D4; "
-            "selection-background-color: #0078D7; selection-color: #FFFFFF; "
-            "font-family: 'Consolas', 'Monaco', 'Menlo', 'Courier New', monospace; "
-            "font-size: 9pt; }"
-            "QPlainTextEdit::placeholderText { color: #A0A0A0; "
-"}"
-        )
+        self.file_preview_edit.setPalette(preview_palette)
+        self.file_preview_edit.setFont(preview_font)
         self.preview_stack.addWidget(self.file_preview_edit)
         self.image_preview_label = QLabel()
         self.image_preview_label.setAlignment(Qt.AlignCenter)
-        self.image_preview_label.setStyleSheet("background-color: #1E1E1E;")
+        self.image_preview_label.setAutoFillBackground(True) # Paints the palette's Window color behind the image
+        self.image_preview_label.setPalette(preview_palette)
         self.image_preview_label.setScaledContents(False)
         self.preview_stack.addWidget(self.image_preview_label)
         preview_layout.addWidget(self.preview_stack)
@@ -326,8 +744,7 @@ class MainWindow(QMainWindow):
         self.placeholder_label.setTextFormat(Qt.RichText)
         self.placeholder_label.setOpenExternalLinks(False) # We handle link activation manually
         self.placeholder_label.linkActivated.connect(self.handle_placeholder_link)
-        # Set the text using a method that can be called to update it if needed
-        self._update_placeholder_text()
+        self.placeholder_label.setText(NO_PROJECT_PLACEHOLDER_HTML) # Static; never rebuilt on project switches
         no_project_layout.addWidget(self.placeholder_label)
         self.content_stack.addWidget(self.no_project_widget)
 
@@ -337,7 +754,7 @@ class MainWindow(QMainWindow):
         self.export_category_label = QLabel("Export Category:") # Store reference to label
         bottom_bar_layout.addWidget(self.export_category_label)
         self.export_category_combo = QComboBox()
-        self.export_category_combo.currentIndexChanged.connect(self.refresh_file_tree_display_indicators)
+        self.export_category_combo.currentIndexChanged.connect(self._on_export_category_changed)
         bottom_bar_layout.addWidget(self.export_category_combo)
         bottom_bar_layout.addSpacerItem(QSpacerItem(40, 20, QSizePolicy.Expanding, QSizePolicy.Minimum))
         self.drop_context_button = QPushButton("Drop Context")
@@ -349,19 +766,8 @@ class MainWindow(QMainWindow):
         main_layout.addLayout(bottom_bar_layout)
 
         self._show_preview_for_path(None) # Initial call
-
-    def _update_placeholder_text(self):
-        """Sets the rich text for the placeholder label."""
-        # Using a known color from the dark palette for the link for better visibility
-        # QPalette().color(QPalette.Link) might also work if palette is set early enough
-        link_color = "#569CD6" # A blue color often used for links in dark themes
-        self.placeholder_label.setText(
-            f'<span style="color: #A0A0A0; '
-"font-weight: bold;\">Create a "
-            f'<a href="action:new_project" style="color: {link_color}; '
-"text-decoration: underline; font-weight: bold;\">new project</a>"
-            f' or select an existing one to get started.</span>'
-        )
+        # Start on the no-project page; _finish_async_init() switches to the project after the first show
+        self.update_ui_for_project_state()
 
     def handle_placeholder_link(self, link_str):
         """Handles clicks on links in the placeholder label."""
@@ -375,18 +781,44 @@ class MainWindow(QMainWindow):
 
     def save_prompt_guide_to_db(self):
         if self.current_project_id and self.prompt_edit.toPlainText() is not None:
-            db_manager.update_project_prompt(self.current_project_id, self.prompt_edit.toPlainText())
+            _WritePromptTask.submit(self._prompt_write_pool, self.current_project_id, self.prompt_edit.toPlainText())
+
+    def _take_unsaved_prompt(self):
+        """Stops a pending prompt autosave and returns (project_id, text) it would have written, or None."""
+        if not self.prompt_save_timer.isActive():
+            return None
+        self.prompt_save_timer.stop()
+        if not self.current_project_id:
+            return None
+        return self.current_project_id, self.prompt_edit.toPlainText()
 
     def load_projects(self):
-        self.project_combo.blockSignals(True)
-        self.project_combo.clear()
+        """
+        Syncs project_combo with the database, touching only rows that changed
+        instead of clearing and re-adding every project.
+        """
+        combo = self.project_combo
         projects = db_manager.get_projects()
-        if not projects:
-            self.project_combo.addItem("No projects yet", None)
-        else:
-            for project in projects:
-                self.project_combo.addItem(project['name'], project['id'])
-        self.project_combo.blockSignals(False)
+        desired_items = [(project['id'], project['name']) for project in projects]
+        if not desired_items:
+            desired_items = [(None, "No projects yet")]
+        desired_ids = {project_id for project_id, _ in desired_items}
+
+        combo_signal_blocker = QSignalBlocker(combo)
+        for row in range(combo.count() - 1, -1, -1): # Backwards so removals don't shift pending rows
+            if combo.itemData(row) not in desired_ids:
+                combo.removeItem(row)
+        for row, (project_id, name) in enumerate(desired_items):
+            if row < combo.count() and combo.itemData(row) == project_id:
+                if combo.itemText(row) != name:
+                    combo.setItemText(row, name)
+                continue
+            for misplaced_row in range(row + 1, combo.count()): # Present but out of order
+                if combo.itemData(misplaced_row) == project_id:
+                    combo.removeItem(misplaced_row)
+                    break
+            combo.insertItem(row, name, project_id)
+        combo_signal_blocker.unblock()
 
     def load_active_project(self):
         active_project_data = db_manager.get_active_project()
@@ -422,15 +854,20 @@ class MainWindow(QMainWindow):
         project = db_manager.get_project_by_id(project_id)
         if project:
             self.current_project_id = project['id']
-            self.current_project_path = os.path.normcase(os.path.normpath(project['path']))
+            self.current_project_path = _norm(project['path'])
+            self._project_path_with_sep = os.path.join(self.current_project_path, '') # No doubled separator for drive roots
+            self._invalidate_directory_contributions() # Full rebuild on project switch
 
-            self.prompt_edit.blockSignals(True)
-            self.prompt_edit.setText(project['prompt_guide'] or "")
-            self.prompt_edit.blockSignals(False)
+            prompt_signal_blocker = QSignalBlocker(self.prompt_edit) # Loading is not an edit; no autosave
+            self.prompt_edit.setPlainText(project['prompt_guide'] or "")
+            prompt_signal_blocker.unblock()
 
+            self._deferred_tree_root = None
             if os.path.isdir(project['path']):
-                self.fs_model.setRootPath(project['path'])
-                self.tree_view.setRootIndex(self.fs_model.index(project['path']))
+                if self.isVisible():
+                    self._set_tree_root(project['path'])
+                else: # E.g. started as the hover icon: no directory scan until the window is first shown
+                    self._deferred_tree_root = project['path']
             else:
                 QMessageBox.warning(self, "Project Path Error",
                                     f"Project path not found: {project['path']}\n"
@@ -449,12 +886,15 @@ class MainWindow(QMainWindow):
         self._show_preview_for_path(None) # Reset preview title
 
     def clear_project_context(self):
+        _norm.cache_clear() # Bound memory; paths of the previous project are no longer needed
         self.current_project_id = None
         self.current_project_path = None
-        self.prompt_edit.blockSignals(True)
+        self._project_path_with_sep = None
+        prompt_signal_blocker = QSignalBlocker(self.prompt_edit)
         self.prompt_edit.clear()
-        self.prompt_edit.blockSignals(False)
+        prompt_signal_blocker.unblock()
 
+        self._deferred_tree_root = None
         self.fs_model.setRootPath("")
         self.tree_view.setRootIndex(self.fs_model.index(""))
 
@@ -475,9 +915,9 @@ class MainWindow(QMainWindow):
                     self.load_projects()
                     idx = self.project_combo.findData(project_id)
                     if idx != -1:
-                        self.project_combo.blockSignals(True) # Avoid premature trigger
+                        combo_signal_blocker = QSignalBlocker(self.project_combo) # Avoid premature trigger
                         self.project_combo.setCurrentIndex(idx)
-                        self.project_combo.blockSignals(False)
+                        combo_signal_blocker.unblock()
                         self.update_project_details(project_id) # Manually update for the new project
                 else:
                     QMessageBox.warning(self, "Error", f"Could not create project '{name}'. "
@@ -503,22 +943,26 @@ class MainWindow(QMainWindow):
         if not self.current_project_id:
             QMessageBox.information(self, "No Project", "Please select or create a project first.")
             return
-        dialog = ManageCategoriesDialog(self.current_project_id, parent_main_window=self)
-        dialog.exec()
+        if self._categories_dialog is None: # Built on first use, then kept hidden and reused
+            self._categories_dialog = ManageCategoriesDialog(self.current_project_id, parent_main_window=self)
+        else:
+            self._categories_dialog.reset(self.current_project_id)
+        self._categories_dialog.exec()
         # Changes in categories might affect display indicators or selected items list
         self.refresh_file_tree_display_indicators()
         # self.load_selected_items() # Already called by ManageCategoriesDialog if parent_main_window is set
 
     def load_categories_for_export(self):
-        self.export_category_combo.blockSignals(True)
+        self._invalidate_selection_caches()
+        combo_signal_blocker = QSignalBlocker(self.export_category_combo) # No per-item index change refreshes
         self.export_category_combo.clear()
         self.export_category_combo.addItem("All Categories", None) # UserData is None
-        if self.current_project_id:
-            categories = db_manager.get_categories(self.current_project_id)
-            for cat in categories:
-                self.export_category_combo.addItem(cat['name'], cat['id']) # UserData is cat_id
-        self.export_category_combo.blockSignals(False)
-        self.refresh_file_tree_display_indicators() # Refresh tree based on new filter
+        self._categories_cache = db_manager.get_categories(self.current_project_id) if self.current_project_id else []
+        for cat in self._categories_cache:
+            self.export_category_combo.addItem(cat['name'], cat['id']) # UserData is cat_id
+        self.export_category_combo.setCurrentIndex(0) # Settle the index while signals are still blocked
+        combo_signal_blocker.unblock()
+        self.refresh_file_tree_display_indicators() # The one refresh for the new filter
 
     def update_ui_for_project_state(self):
         has_project = self.current_project_id is not None
@@ -526,14 +970,13 @@ class MainWindow(QMainWindow):
         if has_project:
             self.content_stack.setCurrentWidget(self.main_interface_widget)
         else:
-            self.content_stack.setCurrentWidget(self.no_project_widget)
-            self._update_placeholder_text() # Ensure placeholder text is correct
+            self.content_stack.setCurrentWidget(self.no_project_widget) # Placeholder text is set once in setup_ui
 
         # Enable/disable components based on project presence
         self.tree_view.setEnabled(has_project)
         self.prompt_edit.setEnabled(has_project)
         self.selected_items_list.setEnabled(has_project)
-        if hasattr(self, 'preview_stack'): self.preview_stack.setEnabled(has_project)
+        self.preview_stack.setEnabled(has_project)
 
         # Set visibility for project-specific buttons and controls
         self.delete_project_button.setVisible(has_project)
@@ -556,7 +999,7 @@ class MainWindow(QMainWindow):
 
         r_path = self.current_project_path # Already normcased
         r_is_dir = True
-        existing_root_sel = db_manager.get_selection_by_path(self.current_project_id, r_path)
+        existing_root_sel = self._selection_by_path.get(r_path)
 
         if existing_root_sel:
             menu.addAction("Project Root (.): Options...",
@@ -581,9 +1024,9 @@ class MainWindow(QMainWindow):
 
         if index.isValid():
             path_from_model = self.fs_model.filePath(index)
-            normcased_path = os.path.normcase(os.path.normpath(path_from_model))
+            normcased_path = _norm(path_from_model)
             is_dir = self.fs_model.isDir(index)
-            existing_selection = db_manager.get_selection_by_path(self.current_project_id, normcased_path)
+            existing_selection = self._selection_by_path.get(normcased_path)
 
             item_display_name = os.path.basename(normcased_path)
             if not item_display_name and normcased_path == self.current_project_path: # Project root itself
@@ -617,7 +1060,7 @@ class MainWindow(QMainWindow):
 
         file_types = None # For files, this remains None
         category_id = existing_selection['category_id'] if existing_selection else None
-        path_for_db = os.path.normpath(path) # Path is already normcased by caller
+        path_for_db = path # Already normalized and normcased by every caller (tree, list, drop handlers)
 
         if is_dir:
             current_types = ""
@@ -637,21 +1080,21 @@ class MainWindow(QMainWindow):
         self.load_selected_items() # Refresh list and tree indicators
 
     def handle_dropped_item_signal(self, path, is_dir):
-        normcased_path = os.path.normcase(os.path.normpath(path))
+        normcased_path = _norm(path)
         if not self.current_project_id:
             QMessageBox.warning(self, "No Active Project", "Please select or create a project first.")
             return
-        existing_selection = db_manager.get_selection_by_path(self.current_project_id, normcased_path)
+        existing_selection = self._selection_by_path.get(normcased_path) # Reloaded by load_selected_items on every write
         self.add_or_update_selection(normcased_path, is_dir, existing_selection)
 
 
     def assign_category_to_selection_dialog(self, path):
         if not self.current_project_id: return
 
-        categories = db_manager.get_categories(self.current_project_id)
+        categories = self._categories_cache # Kept current by load_categories_for_export on every category change
         cat_names = ["<No Category>"] + [c['name'] for c in categories] # Add <No Category> option
 
-        current_selection = db_manager.get_selection_by_path(self.current_project_id, path)
+        current_selection = self._selection_by_path.get(path)
         if not current_selection:
             QMessageBox.warning(self, "Error", f"Could not find selection data for path:\n{path}")
             return
@@ -687,53 +1130,32 @@ class MainWindow(QMainWindow):
             self.load_selected_items() # Refresh list and tree indicators
 
     def load_selected_items(self):
+        self._invalidate_selection_caches() # Every selection add/update/removal reloads through here
         self.selected_items_list.clear()
+        self._selection_by_path = {}
         if not self.current_project_id:
             self._show_preview_for_path(None) # Reset preview title
             self.refresh_file_tree_display_indicators()
             return
 
         selections = db_manager.get_selections(self.current_project_id)
-        for sel_idx, sel in enumerate(selections):
+        self._selection_by_path = {sel['path']: sel for sel in selections} # Serves context menu lookups
+        # Resolved once, not per item; None when there is no valid project to make paths relative to
+        project_path = self.current_project_path if self.current_project_path and os.path.isdir(self.current_project_path) else None
+        project_prefix = self._project_path_with_sep
+        # Fill the list without a relayout/repaint or item signal per row; one repaint once it is complete
+        self.selected_items_list.setUpdatesEnabled(False)
+        list_signal_blocker = QSignalBlocker(self.selected_items_list)
+        for sel in selections:
             sel_normcased_path = sel['path'] # This is already normcased from DB
-
-            item_display_path = ""
-            # Determine how to display the path (relative, external, etc.)
-            if self.current_project_path and os.path.isdir(self.current_project_path):
-                if sel_normcased_path == self.current_project_path:
-                    item_display_path = "."
-                elif sel_normcased_path.startswith(self.current_project_path + os.sep):
-                    try:
-                        item_display_path = os.path.relpath(sel_normcased_path, self.current_project_path)
-                    except ValueError: # Should not happen if startswith is true
-                        item_display_path = os.path.basename(sel_normcased_path)
-                else: # Path is outside the current project tree structure
-                    item_display_path = f"{os.path.basename(sel_normcased_path)} (External to current project tree)"
-            else: # No valid current_project_path to make it relative to
-                base_name = os.path.basename(sel_normcased_path)
-                if sel_normcased_path == base_name: # e.g. "file.txt" (already just a name)
-                    item_display_path = base_name
-                else: # e.g. "/abs/path/to/file.txt" or "rel/path/file.txt"
-                    item_display_path = f"{sel_normcased_path} (Full Path)"
-
-
-            display_text_final = ""
-            if sel['is_directory']:
-                file_types_display = sel['file_types'] if sel['file_types'] else "ALL"
-                if item_display_path == ".": # Project root selected as directory
-                    display_text_final = f". (Dir: {file_types_display})"
-                else:
-                    display_text_final = f"{item_display_path}{os.sep} (Dir: {file_types_display})"
-            else: # It's a file
-                display_text_final = item_display_path
-
-            if sel['category_name']:
-                display_text_final += f"  [{sel['category_name']}]"
-
+            display_text_final = _selection_display_text(sel, project_path, project_prefix)
             item = QListWidgetItem(display_text_final)
-            item.setData(Qt.UserRole, sel_normcased_path) # Store full normcased path
+            item.setData(Qt.UserRole, dict(sel)) # Full selection row (path is normcased), so menus need no DB query
             item.setToolTip(sel_normcased_path) # Tooltip shows full path
             self.selected_items_list.addItem(item)
+        list_signal_blocker.unblock()
+        self.selected_items_list.setUpdatesEnabled(True)
+        self.selected_items_list.viewport().update()
 
         if not selections: # If the list is empty after loading
              self._show_preview_for_path(None) # Reset preview title
@@ -745,15 +1167,13 @@ class MainWindow(QMainWindow):
         item = self.selected_items_list.itemAt(position)
         if not item or not self.current_project_id: return
 
-        normcased_path_from_user_role = item.data(Qt.UserRole) # Already normcased
+        selection_data = item.data(Qt.UserRole) # Selection row stored by load_selected_items
+        normcased_path_from_user_role = selection_data.get('path') if isinstance(selection_data, dict) else None # Already normcased
 
         if not normcased_path_from_user_role or not isinstance(normcased_path_from_user_role, str):
-            QMessageBox.warning(self, "Error", f"Invalid path data in selected item: {normcased_path_from_user_role}")
+            QMessageBox.warning(self, "Error", f"Invalid path data in selected item: {selection_data}")
             return
 
-        selection_data = db_manager.get_selection_by_path(self.current_project_id, normcased_path_from_user_role)
-        # selection_data could be None if item was somehow de-synced, though unlikely with current logic
-
         menu = QMenu()
         menu_item_display_name = os.path.basename(normcased_path_from_user_role)
         if self.current_project_path and normcased_path_from_user_role == self.current_project_path:
@@ -762,16 +1182,12 @@ class MainWindow(QMainWindow):
         remove_action = menu.addAction(f"Remove '{menu_item_display_name}' from Context")
         remove_action.triggered.connect(lambda checked=False, p=normcased_path_from_user_role: self.remove_selected_path(p))
 
-        if selection_data: # Only add these if we have DB data for the selection
-            assign_cat_action = menu.addAction(f"Assign/Change Category for '{menu_item_display_name}'")
-            assign_cat_action.triggered.connect(lambda checked=False, p=normcased_path_from_user_role: self.assign_category_to_selection_dialog(p))
+        assign_cat_action = menu.addAction(f"Assign/Change Category for '{menu_item_display_name}'")
+        assign_cat_action.triggered.connect(lambda checked=False, p=normcased_path_from_user_role: self.assign_category_to_selection_dialog(p))
 
-            if selection_data['is_directory']:
-                edit_types_action = menu.addAction(f"Edit Directory Options for '{menu_item_display_name}'")
-                edit_types_action.triggered.connect(lambda checked=False, p=normcased_path_from_user_role, s=selection_data: self.add_or_update_selection(p, True, s))
-        else:
-            # This case should ideally not be reached if the list is properly synced with the DB.
-            print(f"Warning: No DB selection data found for list item: {normcased_path_from_user_role}")
+        if selection_data['is_directory']:
+            edit_types_action = menu.addAction(f"Edit Directory Options for '{menu_item_display_name}'")
+            edit_types_action.triggered.connect(lambda checked=False, p=normcased_path_from_user_role, s=selection_data: self.add_or_update_selection(p, True, s))
 
 
         if menu.isEmpty(): # Should not happen if remove_action was added
@@ -780,8 +1196,12 @@ class MainWindow(QMainWindow):
 
 
     def _is_binary_file_for_preview(self, file_path):
-        if any(file_path.lower().endswith(ext) for ext in self.BINARY_EXTENSIONS):
+        ext = os.path.splitext(file_path)[1].lower()
+        # Dotfiles such as .DS_Store have no extension per splitext; match them by name
+        if ext in self.BINARY_EXTENSIONS or os.path.basename(file_path).lower() in self.BINARY_EXTENSIONS:
             return True
+        if ext in self.TEXT_EXTENSIONS:
+            return False # No need to open the file
         try:
             with open(file_path, 'rb') as f_check:
                 chunk = f_check.read(1024) # Read a small chunk
@@ -789,18 +1209,23 @@ class MainWindow(QMainWindow):
         except Exception: return True # Treat as binary if read fails
         return False
 
-    def _read_file_content_for_preview(self, file_path):
-        if self._is_binary_file_for_preview(file_path):
-            return True, f"File: {os.path.basename(file_path)}\n\n(Binary file, content not displayed)"
+    def _read_file_content_for_preview(self, file_path, file_size=None):
         try:
-            file_size = os.path.getsize(file_path)
+            # Size check first: it is a single stat (skipped if the caller already has it), and too-large files need no further reads
+            if file_size is None:
+                file_size = os.path.getsize(file_path)
             if file_size > MainWindow.MAX_PREVIEW_SIZE:
                 return True, (f"File: {os.path.basename(file_path)}\n\n"
                               f"(File too large: {file_size // (1024*1024)} MB. "
                               f"Max: {MainWindow.MAX_PREVIEW_SIZE // (1024*1024)} MB)")
 
-            with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
-                content = f.read()
+            if self._is_binary_file_for_preview(file_path):
+                return True, f"File: {os.path.basename(file_path)}\n\n(Binary file, content not displayed)"
+
+            with open(file_path, 'r', encoding='utf-8', errors='replace', buffering=65536) as f:
+                content = f.read(MainWindow.MAX_PREVIEW_SIZE + 1) # Bounded even if the file grew since the size check
+            if len(content) > MainWindow.MAX_PREVIEW_SIZE:
+                content = content[:MainWindow.MAX_PREVIEW_SIZE] + "\n\n...(truncated for preview)"
             return False, content
         except UnicodeDecodeError:
             return True, f"File: {os.path.basename(file_path)}\n\n(Cannot decode file - may be binary or non-UTF-8)"
@@ -808,17 +1233,32 @@ class MainWindow(QMainWindow):
             return True, f"File: {os.path.basename(file_path)}\n\n(Error reading file for preview: {e})"
 
     def _generate_directory_preview_summary(self, dir_path):
-        p = Path(dir_path)
         try:
-            num_files, num_subdirs = 0, 0
-            ext_counts = collections.defaultdict(int)
-
-            for item in p.rglob('*'): # Iterate recursively
-                if item.is_file():
-                    num_files += 1
-                    ext_counts[item.suffix.lower() if item.suffix else "<no_extension>"] += 1
-                elif item.is_dir():
-                    num_subdirs += 1
+            num_subdirs = 0
+            file_exts = [] # One lowercased extension per file; counted in a single Counter pass below
+
+            pending_dirs = [dir_path] # Iterate recursively with an explicit stack
+            while pending_dirs:
+                try:
+                    entries = os.scandir(pending_dirs.pop())
+                except OSError:
+                    continue # Unreadable subdirectory
+                with entries:
+                    for entry in entries:
+                        if entry.is_dir(): # Type comes from the directory listing; no extra stat on most platforms
+                            num_subdirs += 1
+                            # Ignored trees (e.g. .git, node_modules) are counted but not descended into
+                            if not entry.is_symlink() and entry.name not in _TREE_IGNORED_NAMES:
+                                pending_dirs.append(entry.path)
+                        elif entry.is_file():
+                            file_exts.append(os.path.splitext(entry.name)[1].lower())
+
+            num_files = len(file_exts)
+            ext_counts = collections.Counter(file_exts)
+            # Files without a suffix (or ending in a bare '.') are reported together
+            no_ext_count = ext_counts.pop('', 0) + ext_counts.pop('.', 0)
+            if no_ext_count:
+                ext_counts["<no_extension>"] = no_ext_count
 
             summary = [f"Directory: {os.path.basename(dir_path)} (at {dir_path})",
                        f"Contains: {num_files} files, {num_subdirs} subdirectories (recursively)."]
@@ -835,25 +1275,48 @@ class MainWindow(QMainWindow):
             return f"Error scanning directory {dir_path}: {e}"
 
 
+    def _schedule_preview(self, path):
+        """Previews path once the selection has settled for the preview timer interval."""
+        self._pending_preview_path = path
+        self._preview_timer.start()
+
+    def _show_pending_preview(self):
+        self._show_preview_for_path(self._pending_preview_path)
+
     def _show_preview_for_path(self, path):
         if not self.preview_stack: return # Should not happen if UI is set up
+        self._preview_timer.stop() # A direct preview supersedes any scheduled one
+
+        # One stat serves the existence, type, size and mtime checks below
+        path_stat = None
+        if path:
+            try:
+                path_stat = os.stat(path)
+            except OSError: # Missing or inaccessible; reported like a nonexistent path
+                path_stat = None
+        is_file = path_stat is not None and stat.S_ISREG(path_stat.st_mode)
+        is_dir = path_stat is not None and stat.S_ISDIR(path_stat.st_mode)
+
+        # Re-selecting the file already on display (e.g. on a tree refresh) keeps the current preview
+        preview_key = None
+        if is_file:
+            preview_size = self.preview_stack.size()
+            preview_key = (path, path_stat.st_mtime_ns, path_stat.st_size, preview_size.width(), preview_size.height())
+        if preview_key is not None and preview_key == self._last_preview_key:
+            return
+        self._last_preview_key = preview_key
+        self._preview_request_id += 1 # Any preview still loading is now stale
 
         if self.current_highlighter:
-            self.current_highlighter.setDocument(None) # Disconnect old highlighter
-            self.current_highlighter = None
+            self.current_highlighter.setDocument(None) # Detach; re-attached for the next highlighted file
 
         self.image_preview_label.clear()
         self.file_preview_edit.clear()
 
         # Update preview title label
-        if path and os.path.exists(path) and os.path.isfile(path):
-            file_name = os.path.basename(path)
-            try:
-                file_size_bytes = os.path.getsize(path)
-                file_size_kb = file_size_bytes / 1024.0
-                self.preview_title_label.setText(f"File Preview: {file_name} - {file_size_kb:.2f} KB")
-            except OSError: # File might not be accessible (e.g. permissions)
-                self.preview_title_label.setText(f"File Preview: {file_name} - (size unavailable)")
+        if is_file:
+            file_size_kb = path_stat.st_size / 1024.0
+            self.preview_title_label.setText(f"File Preview: {os.path.basename(path)} - {file_size_kb:.2f} KB")
         else: # No path, or path is a directory, or path doesn't exist
             self.preview_title_label.setText("File Preview:")
 
@@ -865,7 +1328,7 @@ class MainWindow(QMainWindow):
             self.preview_stack.setCurrentWidget(self.file_preview_edit)
             return
 
-        if not os.path.exists(path):
+        if path_stat is None:
             self.file_preview_edit.setPlainText(f"Path does not exist: {path}")
             self.preview_stack.setCurrentWidget(self.file_preview_edit)
             return
@@ -877,16 +1340,31 @@ class MainWindow(QMainWindow):
         if not (preview_size.isValid() and preview_size.width() > 0 and preview_size.height() > 0):
             preview_size = QSize(300, 300) # Fallback if size is not yet determined
 
-        if os.path.isfile(path):
+        if is_file:
+            if ext in self.RASTER_IMAGE_EXTENSIONS or ext in self.SVG_IMAGE_EXTENSIONS:
+                image_cache_key = (path, path_stat.st_mtime_ns, preview_size.width(), preview_size.height())
+                cached_pixmap = self._image_pixmap_cache.get(image_cache_key)
+                if cached_pixmap is not None:
+                    self._image_pixmap_cache.move_to_end(image_cache_key) # Most recently used
+                    self.image_preview_label.setPixmap(cached_pixmap)
+                    self.preview_stack.setCurrentWidget(self.image_preview_label)
+                    return # Handled image from cache
             if ext in self.RASTER_IMAGE_EXTENSIONS:
-                pixmap = QPixmap(path)
-                if pixmap.isNull():
+                reader = QImageReader(path)
+                image_size = reader.size() # Read from the header; invalid if the format cannot tell up front
+                # Scale if it's larger than the preview area, maintaining aspect ratio.
+                # Setting the size before read() lets the codec decode straight to the smaller image.
+                if image_size.isValid() and (image_size.width() > preview_size.width() or image_size.height() > preview_size.height()):
+                    reader.setScaledSize(image_size.scaled(preview_size, Qt.KeepAspectRatio))
+                image = reader.read()
+                if image.isNull():
                     self.file_preview_edit.setPlainText(f"File: {os.path.basename(path)}\n\n(Error loading image)")
                     self.preview_stack.setCurrentWidget(self.file_preview_edit)
                 else:
-                    # Scale pixmap if it's larger than the preview area, maintaining aspect ratio
-                    if pixmap.width() > preview_size.width() or pixmap.height() > preview_size.height():
-                        pixmap = pixmap.scaled(preview_size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+                    if image.width() > preview_size.width() or image.height() > preview_size.height(): # Size was unknown before reading
+                        image = image.scaled(preview_size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+                    pixmap = QPixmap.fromImage(image)
+                    self._cache_image_pixmap(image_cache_key, pixmap)
                     self.image_preview_label.setPixmap(pixmap)
                     self.preview_stack.setCurrentWidget(self.image_preview_label)
                 return # Handled image
@@ -914,6 +1392,7 @@ class MainWindow(QMainWindow):
                         painter = QPainter(img)
                         renderer.render(painter, QRectF(img.rect())) # Render onto the QPixmap
                         painter.end()
+                        self._cache_image_pixmap(image_cache_key, img)
                         self.image_preview_label.setPixmap(img)
                         self.preview_stack.setCurrentWidget(self.image_preview_label)
                 else: # SVG Support not available
@@ -922,28 +1401,112 @@ class MainWindow(QMainWindow):
                 return # Handled SVG or SVG support missing
 
             # If not an image, try to read as text
-            is_message_only, content = self._read_file_content_for_preview(path)
-            self.file_preview_edit.setPlainText(content)
-            self.preview_stack.setCurrentWidget(self.file_preview_edit)
-            if not is_message_only: # Apply syntax highlighting if it's actual file content
-                supported_syntax_extensions = [
-                    '.py', '.js', '.dart', '.html', '.htm', '.yaml', '.json', '.txt', '.md',
-                    '.java', '.cs', '.cpp', '.c', '.h', '.hpp', '.go', '.php', '.rb', '.swift', '.kt', '.rs'
-                    # Add more as needed, ensure they match SyntaxHighlighter keys
-                ]
-                if ext in supported_syntax_extensions:
-                    self.current_highlighter = SyntaxHighlighter(self.file_preview_edit.document(), ext)
-        elif os.path.isdir(path):
-            self.file_preview_edit.setPlainText(self._generate_directory_preview_summary(path))
-            self.preview_stack.setCurrentWidget(self.file_preview_edit)
+            text_cache_key = (path, path_stat.st_mtime_ns, path_stat.st_size)
+            cached_text = self._preview_text_cache.get(text_cache_key)
+            if cached_text is not None:
+                self._preview_text_cache.move_to_end(text_cache_key) # Most recently used
+                self._display_text_preview(ext, *cached_text)
+            else:
+                self._start_preview_load(
+                    functools.partial(self._read_file_content_for_preview, path, path_stat.st_size),
+                    (path, ext, text_cache_key))
+        elif is_dir:
+            # Directory contents change without the directory's own mtime changing, so summaries are not cached
+            self._start_preview_load(
+                lambda: (True, self._generate_directory_preview_summary(path)),
+                (path, ext, None))
         else: # Not a file or directory (e.g., broken link, or something else)
             self.file_preview_edit.setPlainText(f"Not a file or directory: {path}")
             self.preview_stack.setCurrentWidget(self.file_preview_edit)
 
+    def _cache_image_pixmap(self, cache_key, pixmap):
+        self._image_pixmap_cache[cache_key] = pixmap
+        if len(self._image_pixmap_cache) > self.IMAGE_PIXMAP_CACHE_SIZE:
+            self._image_pixmap_cache.popitem(last=False) # Evict the least recently used
+
+    def _start_preview_load(self, load, context):
+        """Shows a loading placeholder and reads the preview text on a worker (see _on_preview_loaded)."""
+        self.file_preview_edit.setPlaceholderText("Loading preview...")
+        self.preview_stack.setCurrentWidget(self.file_preview_edit)
+        QThreadPool.globalInstance().start(
+            _PreviewLoadTask(self._preview_request_id, load, context, self._preview_signals))
+
+    @Slot(int, object, bool, str)
+    def _on_preview_loaded(self, request_id, context, is_message_only, text):
+        if request_id != self._preview_request_id:
+            return # The user has moved on to another preview
+        path, ext, text_cache_key = context
+        if text_cache_key is not None:
+            self._preview_text_cache[text_cache_key] = (is_message_only, text)
+            if len(self._preview_text_cache) > self.PREVIEW_TEXT_CACHE_SIZE:
+                self._preview_text_cache.popitem(last=False) # Evict the least recently used
+        self._display_text_preview(ext, is_message_only, text)
+
+    def _display_text_preview(self, ext, is_message_only, text):
+        self.file_preview_edit.setPlaceholderText("")
+        self.file_preview_edit.setPlainText(text)
+        self.preview_stack.setCurrentWidget(self.file_preview_edit)
+        if not is_message_only: # Apply syntax highlighting if it's actual file content
+            if ext in self.SYNTAX_HIGHLIGHT_EXTENSIONS:
+                if self.current_highlighter is None:
+                    from syntax_highlighter import SyntaxHighlighter # Deferred until a file needs highlighting
+                    self.current_highlighter = SyntaxHighlighter(self.file_preview_edit.document(), ext)
+                else:
+                    self.current_highlighter.set_language(ext)
+                    self.current_highlighter.setDocument(self.file_preview_edit.document())
+
+    def _on_tree_expanded(self, index: QModelIndex):
+        if self.current_project_id is not None:
+            self._expanded_paths_by_project.setdefault(self.current_project_id, set()).add(self.fs_model.filePath(index))
+
+    def _on_tree_collapsed(self, index: QModelIndex):
+        if self.current_project_id is not None:
+            self._expanded_paths_by_project.get(self.current_project_id, set()).discard(self.fs_model.filePath(index))
+
+    def _set_tree_root(self, project_path):
+        """Points the file tree at the project directory and re-expands its remembered directories."""
+        # Suspend sorting and repaints while the root changes; both resume on the next event loop pass,
+        # after the model has taken in the first batch of directory results
+        self.tree_view.setSortingEnabled(False)
+        self.tree_view.setUpdatesEnabled(False)
+        QTimer.singleShot(0, self._resume_tree_view_after_root_switch)
+        # Re-rooting resets the current index; no preview requests for the transient selection changes
+        selection_signal_blocker = QSignalBlocker(self.tree_view.selectionModel())
+        self.fs_model.setRootPath(project_path)
+        self.tree_view.setRootIndex(self.fs_model.index(project_path))
+        self._restore_expanded_paths(self.current_project_id)
+        selection_signal_blocker.unblock()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self._deferred_tree_root is not None: # Project was loaded while the window was hidden
+            project_path, self._deferred_tree_root = self._deferred_tree_root, None
+            self._set_tree_root(project_path)
+
+    def _restore_expanded_paths(self, project_id):
+        """
+        Re-expands the directories that were open the last time this project was shown.
+        Called from _set_tree_root() while repaints and tree selection signals are suspended,
+        so the view redraws once rather than per directory.
+        """
+        expanded_paths = self._expanded_paths_by_project.get(project_id)
+        if not expanded_paths:
+            return
+        for dir_path in list(expanded_paths): # expand() re-adds to the set via _on_tree_expanded
+            index = self.fs_model.index(dir_path)
+            if index.isValid(): # Directory may have been removed since
+                self.tree_view.expand(index)
+            else:
+                expanded_paths.discard(dir_path)
+
+    def _resume_tree_view_after_root_switch(self):
+        self.tree_view.setUpdatesEnabled(True)
+        self.tree_view.setSortingEnabled(True) # Sorts once by the header's current sort indicator
+
     @Slot(QModelIndex, QModelIndex)
     def _handle_tree_view_selection(self, current: QModelIndex, previous: QModelIndex):
         if current.isValid() and self.fs_model.rootPath() != "": # Ensure a project is loaded
-            self._show_preview_for_path(self.fs_model.filePath(current))
+            self._schedule_preview(self.fs_model.filePath(current))
         elif not self.fs_model.rootPath(): # No project loaded
              self._show_preview_for_path(None) # Reset preview including title
         # If current is not valid but a project is loaded, it means selection was cleared in tree.
@@ -954,19 +1517,36 @@ class MainWindow(QMainWindow):
     @Slot(object, object)
     def _handle_selected_items_list_selection(self, current: QListWidgetItem, previous: QListWidgetItem):
         if current:
-            self._show_preview_for_path(current.data(Qt.UserRole)) # Path stored in UserRole
+            self._schedule_preview(current.data(Qt.UserRole)['path']) # Selection row stored in UserRole
         else: # Selection cleared in the list
             self._show_preview_for_path(None) # Reset preview including title
 
     def get_effective_selections_for_display(self):
         if not self.current_project_id:
             return []
-        category_id_filter = self.export_category_combo.currentData() # This is the ID, or None for "All"
-        selections = db_manager.get_selections(self.current_project_id, category_id_filter)
-        return selections
+        if self._effective_selections_cache is None:
+            category_id_filter = self.export_category_combo.currentData() # This is the ID, or None for "All"
+            self._effective_selections_cache = db_manager.get_selections(self.current_project_id, category_id_filter)
+        return self._effective_selections_cache
+
+    def _invalidate_selection_caches(self):
+        """Marks cached selections stale after selections, categories or the export filter change."""
+        self._effective_selections_cache = None
+        self._selections_for_display_dirty = True
 
-    def get_detailed_inclusion_map(self, effective_selections):
-        included_files_map = {} # Stores {normcased_abs_path: True}
+    def _on_export_category_changed(self, index):
+        self._invalidate_selection_caches()
+        self.refresh_file_tree_display_indicators()
+
+    def get_detailed_inclusion_map(self, effective_selections, directory_contributions):
+        """
+        Returns (set of normcased absolute file paths the given selections include,
+        {(dir path, file_types): frozenset of files} for every directory selection).
+        Runs on a pool thread: directory_contributions is a private copy of earlier results, reused
+        instead of walking those directories again. The caller stores the returned contributions.
+        """
+        included_files = set()
+        contributions = {}
         for sel_idx, sel in enumerate(effective_selections):
             sel_normcased_path = sel['path'] # Already normcased from DB
 
@@ -974,53 +1554,83 @@ class MainWindow(QMainWindow):
                 continue # Skip if path doesn't exist
 
             if sel['is_directory']:
-                extensions_to_include = []
-                exact_filenames_to_include_normcased = []
+                contribution_key = (sel_normcased_path, sel['file_types'])
+                directory_files = directory_contributions.get(contribution_key)
+                if directory_files is not None:
+                    contributions[contribution_key] = directory_files
+                    included_files.update(directory_files) # Walked by an earlier build, nothing on disk changed since
+                    continue
+
+                extensions_to_include, exact_filenames_to_include_normcased = (), frozenset()
                 include_all_files_in_dir = True # Default if file_types is None or empty
 
                 if sel['file_types']: # If not None and not empty string
                     include_all_files_in_dir = False
-                    for ft_item_raw in sel['file_types'].split(','):
-                        ft_item = ft_item_raw.strip()
-                        if not ft_item: continue
-                        if ft_item.startswith('.'): # Assumed to be an extension
-                            extensions_to_include.append(ft_item.lower())
-                        else: # Assumed to be an exact filename
-                            exact_filenames_to_include_normcased.append(os.path.normcase(ft_item))
-
-                for root, dirnames, filenames in os.walk(sel_normcased_path):
-                    # Filter out ignored directory names for recursion
-                    dirnames[:] = [d for d in dirnames if d not in context_generator.DEFAULT_TREE_IGNORED_NAMES and not d.startswith('.')]
-
-                    for f_name_original_case in filenames:
-                        f_path_abs_normcased = os.path.normcase(os.path.normpath(os.path.join(root, f_name_original_case)))
-                        f_name_normcased = os.path.normcase(f_name_original_case)
-
-                        should_include_this_file = False
-                        if include_all_files_in_dir:
-                            should_include_this_file = True
-                        else:
-                            if f_name_normcased in exact_filenames_to_include_normcased:
-                                should_include_this_file = True
-                            elif any(f_name_normcased.endswith(ext) for ext in extensions_to_include):
-                                should_include_this_file = True
-
-                        if should_include_this_file:
-                            included_files_map[f_path_abs_normcased] = True
+                    # endswith() takes the tuple in a single C call, the set gives O(1) lookups
+                    extensions_to_include, exact_filenames_to_include_normcased = _parse_file_types(sel['file_types'])
+                directory_files = []
+                for f_path_abs_normcased, f_name_original_case in _iter_project_files(sel_normcased_path):
+                    if not include_all_files_in_dir:
+                        f_name_normcased = _normcase(f_name_original_case)
+                        if (f_name_normcased not in exact_filenames_to_include_normcased
+                                and not f_name_normcased.endswith(extensions_to_include)):
+                            continue
+                    directory_files.append(f_path_abs_normcased)
+                contributions[contribution_key] = frozenset(directory_files)
+                included_files.update(directory_files)
             else: # It's a file selection
-                included_files_map[sel_normcased_path] = True
-        return included_files_map
+                included_files.add(sel_normcased_path)
+        return included_files, contributions # Removed or edited selections drop out of the cache
 
+    def _store_directory_contributions(self, contributions, generation):
+        """Caches the directory walks of a finished inclusion build, unless they were invalidated meanwhile."""
+        if generation == self._contributions_generation:
+            self._directory_contributions = contributions
 
-    def refresh_file_tree_display_indicators(self):
-        if hasattr(self.fs_model, 'refresh_display_indicators'):
+    def _invalidate_directory_contributions(self, changed_dir=None):
+        """
+        Forgets cached directory walks: all of them, or those of selections containing changed_dir.
+        Returns True if anything was dropped.
+        """
+        self._contributions_generation += 1 # Walks already running may predate the change
+        if changed_dir is None:
+            self._directory_contributions = {}
+            return True
+        stale_keys = [key for key in self._directory_contributions
+                      if changed_dir == key[0] or changed_dir.startswith(os.path.join(key[0], ''))]
+        for key in stale_keys:
+            del self._directory_contributions[key]
+        return bool(stale_keys)
+
+    def _on_tree_directory_loaded(self, path):
+        self._loaded_tree_dirs.add(_norm(path))
+
+    def _on_tree_rows_changed(self, parent, first, last):
+        """Rows appeared in or vanished from a directory the tree has loaded; re-walk selections covering it."""
+        if not self._directory_contributions:
+            return
+        changed_dir = _norm(self.fs_model.filePath(parent))
+        if changed_dir not in self._loaded_tree_dirs:
+            return # The directory's first listing (e.g. on expand), not a change on disk
+        if self._invalidate_directory_contributions(changed_dir):
+            self._selections_for_display_dirty = True
             self.fs_model.refresh_display_indicators()
-        elif isinstance(self.fs_model, QFileSystemModel): # Fallback for standard model if custom not used
-            # This will trigger a repaint, which is often enough if data() method is simple
-            self.fs_model.layoutChanged.emit()
+
+
+    def refresh_file_tree_display_indicators(self, rescan=False):
+        """
+        Refreshes the asterisks in the tree. The inclusion map is only rebuilt when the selections
+        changed since the last build, or when rescan is True because files on disk changed.
+        """
+        if rescan:
+            self._selections_for_display_dirty = True
+            self._invalidate_directory_contributions() # Files on disk changed; walk every selected directory again
+        self.fs_model.refresh_display_indicators()
 
 
     def drop_context(self):
+        if self._drop_in_progress:
+            return # The previous drop is still being written
         if not self.current_project_id or not self.current_project_path:
             QMessageBox.warning(self, "Error", "No active project selected, or project path is invalid.")
             return
@@ -1043,8 +1653,7 @@ class MainWindow(QMainWindow):
             if self.hover_widget and self.hover_widget.isVisible():
                 anchor_widget = self.hover_widget # Use hover widget as anchor
 
-        export_category_filter_id = self.export_category_combo.currentData() # ID or None
-        selections_for_context = db_manager.get_selections(self.current_project_id, export_category_filter_id)
+        selections_for_context = self.get_effective_selections_for_display() # Same export category filter
 
         if not selections_for_context:
             self.notification_widget.show_message(
@@ -1052,70 +1661,68 @@ class MainWindow(QMainWindow):
                 anchor_widget=anchor_widget
             )
             if self.isVisible() and not self.isMinimized(): self.save_gui_position()
-            elif self.hover_widget and self.hover_widget.isVisible(): self.hover_widget.save_current_position()
+            elif self.hover_widget and self.hover_widget.isVisible(): self.save_hover_icon_position()
             return
 
         context_file_leaf_name = "context.txt"
-        try:
-            # Combine all known "skippable" extensions for context generation
-            binary_like_extensions = list(set(
-                self.BINARY_EXTENSIONS +
-                self.RASTER_IMAGE_EXTENSIONS +
-                self.SVG_IMAGE_EXTENSIONS
-            ))
-
-            context_lines = context_generator.generate_context_file_data(
-                original_project_path_from_db, # Original case project path for display in context.txt
-                selections_for_context,        # Paths in selections are normcased
-                binary_like_extensions,
-                context_file_leaf_name
-            )
-        except Exception as e:
-            QMessageBox.critical(self, "Context Generation Error", f"An error occurred while generating the context data: {e}")
-            print(f"Context generation error: {e}")
-            return
-
-        context_file_full_path = os.path.join(original_project_path_from_db, context_file_leaf_name)
-        try:
-            with open(context_file_full_path, 'w', encoding='utf-8') as f:
-                f.write("\n".join(context_lines))
-
+        self._drop_in_progress = True
+        self._drop_anchor_widget = anchor_widget
+        QApplication.setOverrideCursor(Qt.WaitCursor) # Busy indicator until the worker reports back
+        QThreadPool.globalInstance().start(_DropContextTask(
+            original_project_path_from_db,
+            selections_for_context,
+            self.BINARY_LIKE_EXTENSIONS,
+            context_file_leaf_name,
+            self._drop_signals
+        ))
+
+    @Slot(str, object)
+    def _on_context_dropped(self, context_file_full_path, error):
+        """Handles the result of a _DropContextTask on the GUI thread."""
+        QApplication.restoreOverrideCursor()
+        self._drop_in_progress = False
+        anchor_widget = self._drop_anchor_widget or self
+        self._drop_anchor_widget = None
+
+        if error is not None:
+            error_title, error_message = error
+            QMessageBox.critical(self, error_title, error_message)
+        else:
             self.notification_widget.show_message(
-                f"Context file generated: {context_file_leaf_name}\nPrompt copied to clipboard.",
+                f"Context file generated: {os.path.basename(context_file_full_path)}\nPrompt copied to clipboard.",
                 anchor_widget=anchor_widget
             )
 
-            self.refresh_file_tree_display_indicators() # Update * in tree
-            # Try to select and scroll to the generated context.txt in the tree view
-            if self.fs_model and self.tree_view and self.fs_model.rootPath() != "":
-                context_file_model_index = self.fs_model.index(context_file_full_path)
-                if context_file_model_index.isValid():
-                    self.tree_view.setCurrentIndex(context_file_model_index)
-                    self.tree_view.scrollTo(context_file_model_index, QAbstractItemView.PositionAtCenter)
-                    # Also update preview to show the newly generated context.txt
-                    self._show_preview_for_path(context_file_full_path)
-                else: # If index is not valid (e.g.
-                     # fs_model not fully synced), still try to show preview
-                     self._show_preview_for_path(context_file_full_path)
-
-        except Exception as e:
-            QMessageBox.critical(self, "Error Saving Context File", f"Could not save '{context_file_leaf_name}': {e}")
-            print(f"Error saving '{context_file_leaf_name}': {e}")
+            self.refresh_file_tree_display_indicators(rescan=True) # Update * in tree; the drop may have added files
+            self._reveal_dropped_context_file(context_file_full_path)
 
         # Save positions after action
         if self.isVisible() and not self.isMinimized(): self.save_gui_position()
-        elif self.hover_widget and self.hover_widget.isVisible(): self.hover_widget.save_current_position()
+        elif self.hover_widget and self.hover_widget.isVisible(): self.save_hover_icon_position()
 
 
+    def _reveal_dropped_context_file(self, context_file_full_path):
+        """
+        Selects and scrolls to the generated context file in the tree, then previews it
+        on the next event loop pass, once the tree has settled and repainted in one go.
+        """
+        if self.fs_model and self.tree_view and self.fs_model.rootPath() != "":
+            context_file_model_index = self.fs_model.index(context_file_full_path)
+            if context_file_model_index.isValid(): # May be invalid if fs_model is not fully synced yet
+                self.tree_view.setCurrentIndex(context_file_model_index)
+                self.tree_view.scrollTo(context_file_model_index, QAbstractItemView.PositionAtCenter)
+        # Still preview the file if it is not in the tree yet; supersedes the preview scheduled by the selection change
+        QTimer.singleShot(0, lambda: self._show_preview_for_path(context_file_full_path))
+
     def collapse_to_hover_icon(self):
         self.save_gui_position() # Save main window pos before hiding
         self.hide()
-        db_manager.set_app_setting(LAST_UI_MODE_KEY, 'hover') # Persist current mode
+        self._queue_app_setting(LAST_UI_MODE_KEY, 'hover') # Persist current mode
 
         # Attempt to load hover icon's last saved position
         try:
-            hover_x_str = db_manager.get_app_setting(HOVER_POS_X_KEY)
-            hover_y_str = db_manager.get_app_setting(HOVER_POS_Y_KEY)
+            hover_x_str = self._get_app_setting(HOVER_POS_X_KEY)
+            hover_y_str = self._get_app_setting(HOVER_POS_Y_KEY)
             if hover_x_str is not None and hover_y_str is not None:
                 self.hover_widget.move(QPoint(int(hover_x_str), int(hover_y_str)))
             else: # No saved position, center it
@@ -1132,14 +1739,14 @@ class MainWindow(QMainWindow):
 
     def show_main_window_from_hover(self, hover_screen: QGuiApplication.primaryScreen()): # hover_screen can be None
         if self.hover_widget:
-            self.hover_widget.save_current_position() # Save hover icon pos before hiding it
+            self.save_hover_icon_position() # Save hover icon pos before hiding it
             self.hover_widget.hide()
 
-        db_manager.set_app_setting(LAST_UI_MODE_KEY, 'gui') # Persist current mode
+        self._queue_app_setting(LAST_UI_MODE_KEY, 'gui') # Persist current mode
         gui_restored_to_saved_pos = False
         try:
-            gui_x_str = db_manager.get_app_setting(GUI_POS_X_KEY)
-            gui_y_str = db_manager.get_app_setting(GUI_POS_Y_KEY)
+            gui_x_str = self._get_app_setting(GUI_POS_X_KEY)
+            gui_y_str = self._get_app_setting(GUI_POS_Y_KEY)
             if gui_x_str is not None and gui_y_str is not None:
                 self.move(QPoint(int(gui_x_str), int(gui_y_str)))
                 gui_restored_to_saved_pos = True
@@ -1164,87 +1771,111 @@ class MainWindow(QMainWindow):
 
     def close_application_from_hover(self):
         if self.hover_widget:
-            self.hover_widget.save_current_position() # Save its position even if closing from hover
+            self.save_hover_icon_position() # Save its position even if closing from hover
         self.close() # This will trigger the main window's closeEvent
 
+    def _persist_gui_mode(self):
+        self.save_gui_position() # Save GUI pos even if it was minimized
+        self._queue_app_setting(LAST_UI_MODE_KEY, 'gui')
+
+    def _persist_hover_mode(self):
+        self.save_hover_icon_position() # Queued, so it commits together with the mode below
+        self._queue_app_setting(LAST_UI_MODE_KEY, 'hover')
+
+    def _persist_hover_pos_only(self):
+        # Keep LAST_UI_MODE_KEY as 'hover'; if we have a hover_widget instance, try to save its pos
+        self.save_hover_icon_position()
+
+    # (main GUI visible, hover icon visible, last stored mode) -> function persisting position and mode on close.
+    # The stored mode is only read when neither window is visible.
+    _CLOSE_MODE_ACTIONS = {
+        (True, False, None): _persist_gui_mode,
+        (False, True, None): _persist_hover_mode,
+        (False, False, 'hover'): _persist_hover_pos_only,
+        (False, False, 'gui'): _persist_gui_mode,
+    }
+
     def closeEvent(self, event):
-        if self.prompt_save_timer.isActive(): # Ensure pending prompt changes are saved
-            self.prompt_save_timer.stop()
-            self.save_prompt_guide_to_db()
+        unsaved_prompt = self._take_unsaved_prompt() # Written below, together with the settings
+        self._prompt_write_pool.waitForDone() # Let queued prompt writes reach the database first
 
         # Determine which UI mode was last active to save its position and persist the mode
-        if self.isVisible() and not self.isMinimized(): # Main GUI is visible
-            self.save_gui_position()
-            db_manager.set_app_setting(LAST_UI_MODE_KEY, 'gui')
-        else: # Main GUI is not visible (either hover icon is active or app was closed while minimized)
-            if self.hover_widget and self.hover_widget.isVisible(): # Hover icon is active
-                self.hover_widget.save_current_position()
-                db_manager.set_app_setting(LAST_UI_MODE_KEY, 'hover')
-            else: # Neither is visible (e.g., closed from minimized state or error)
-                  # Check last known mode from settings; if it was hover, assume hover pos is more relevant
-                  last_known_mode = db_manager.get_app_setting(LAST_UI_MODE_KEY)
-                  if last_known_mode == 'hover':
-                    # If we have a hover_widget instance, try to save its pos
-                    if self.hover_widget: self.hover_widget.save_current_position()
-                    # Keep LAST_UI_MODE_KEY as 'hover'
-                  else: # Default to saving GUI position and mode 'gui'
-                      self.save_gui_position() # Save GUI pos even if it was minimized
-                      db_manager.set_app_setting(LAST_UI_MODE_KEY, 'gui')
-
-
-        if hasattr(self, 'notification_widget') and self.notification_widget:
+        gui_visible = self.isVisible() and not self.isMinimized()
+        hover_visible = (not gui_visible and self.hover_widget is not None
+                         and self.hover_widget.isVisible())
+        last_known_mode = None
+        if not gui_visible and not hover_visible: # Closed from minimized state or error: fall back to the stored mode
+            last_known_mode = 'hover' if self._get_app_setting(LAST_UI_MODE_KEY) == 'hover' else 'gui'
+        self._CLOSE_MODE_ACTIONS[(gui_visible, hover_visible, last_known_mode)](self)
+        with db_manager.batch(): # Prompt and everything still queued in one transaction
+            if unsaved_prompt is not None:
+                db_manager.update_project_prompt(*unsaved_prompt)
+            self._flush_settings()
+
+
+        if self.notification_widget is not None:
             self.notification_widget.close() # Clean up notification widget
-        if hasattr(self, 'hover_widget') and self.hover_widget: # Hover widget might not be fully closed yet
-            # self.hover_widget.close() # Let its own logic handle closing if necessary, or it's already hidden
-            pass # Avoid explicitly closing hover_widget here as it might be handled by app quit
 
         super().closeEvent(event) # Call base class to allow window to close
         if event.isAccepted():    # If close is not vetoed
-            QApplication.instance().quit() # Ensure application quits
+            # Needed: when closing from the hover icon this window is already hidden, and the icon is a
+            # Qt.Tool window, which does not count for quitOnLastWindowClosed
+            self._app.quit()
+
+
+def load_style_sheet(path):
+    """
+    Reads a QSS stylesheet from a Qt resource path or a file on disk.
+    Returns an empty string (leaving widgets unstyled) if it cannot be opened.
+    """
+    qss_file = QFile(path)
+    if not qss_file.open(QIODevice.ReadOnly | QIODevice.Text):
+        print(f"Warning: Stylesheet '{path}' could not be loaded.")
+        return ""
+    try:
+        return bytes(qss_file.readAll()).decode("utf-8")
+    finally:
+        qss_file.close()
+
+
+def apply_theme(app, palette, style_sheet):
+    """
+    Applies a palette and global stylesheet to the application.
+    Repaints of existing top-level windows are suspended while both are applied,
+    so a theme change triggers a single re-layout instead of one per setter.
+    """
+    suspended_windows = [w for w in app.topLevelWidgets() if w.updatesEnabled()]
+    for widget in suspended_windows:
+        widget.setUpdatesEnabled(False)
+    try:
+        app.setPalette(palette)
+        app.setStyleSheet(style_sheet)
+    finally:
+        for widget in suspended_windows:
+            widget.setUpdatesEnabled(True)
+
+
+def apply_dark_theme(app):
+    """Applies the Fusion style with the app's dark palette and global stylesheet."""
+    if app.style().name().lower() != "fusion": # Avoid a redundant re-polish where Fusion is already the default
+        app.setStyle("Fusion") # Consistent style
+    # Global stylesheet (tooltip style ensuring visibility against the dark theme)
+    apply_theme(app, dark_palette(), load_style_sheet(DARK_STYLE_SHEET_PATH))
 
 
 if __name__ == '__main__':
+    # Merge bursts of mouse-move/resize events; must be set before any widget exists
+    QApplication.setAttribute(Qt.AA_CompressHighFrequencyEvents, True)
     app = QApplication(sys.argv)
 
-    icon_path = "contextdropper.png" # Ensure this is in the correct path or use absolute
-    if os.path.exists(icon_path):
-        app.setWindowIcon(QIcon(icon_path))
-    else:
-        print(f"Warning: Application icon '{icon_path}' not found.")
-
-    app.setStyle("Fusion") # Consistent style
-
-    # Dark Theme Palette
-    dark_palette = QPalette()
-    dark_palette.setColor(QPalette.Window, QColor(53, 53, 53))
-    dark_palette.setColor(QPalette.WindowText, Qt.white)
-    dark_palette.setColor(QPalette.Base, QColor(35, 35, 35)) # Text edit backgrounds
-    dark_palette.setColor(QPalette.AlternateBase, QColor(53, 53, 53)) # List alternate rows
-    dark_palette.setColor(QPalette.ToolTipBase, Qt.white)
-    dark_palette.setColor(QPalette.ToolTipText, Qt.black)
-    dark_palette.setColor(QPalette.Text, Qt.white)
-    dark_palette.setColor(QPalette.Button, QColor(53, 53, 53))
-    dark_palette.setColor(QPalette.ButtonText, Qt.white)
-    dark_palette.setColor(QPalette.BrightText, Qt.red)
-    dark_palette.setColor(QPalette.Link, QColor(42, 130, 218)) # Blue for links
-    dark_palette.setColor(QPalette.Highlight, QColor(42, 130, 218)) # Selection highlight
-    dark_palette.setColor(QPalette.HighlightedText, Qt.black) # Text in selection
-    dark_palette.setColor(QPalette.PlaceholderText, QColor(128,128,128)) # Placeholder text color
-    app.setPalette(dark_palette)
-
-    # Tooltip style (ensure visibility against dark theme if needed)
-    app.setStyleSheet("QToolTip { color: #000000; background-color: #ffffff; border: 1px solid black; }")
-
-
-    # Initialize database (ensure it exists and schema is up-to-date)
-    if not os.path.exists(db_manager.DATABASE_NAME):
-        print(f"Database '{db_manager.DATABASE_NAME}' not found. Initializing...")
-        db_manager.init_db()
-    else:
-        print(f"Database '{db_manager.DATABASE_NAME}' found. Ensuring schema is up-to-date...")
-        db_manager.init_db() # init_db is safe to call multiple times
+    # QIcon loads the file on demand and falls back to the default icon if it is missing; no stat up front
+    app.setWindowIcon(QIcon(APP_ICON_PATH))
+
+    # Applied before any window exists: deferring it past the first paint would flash the light default theme
+    apply_dark_theme(app)
 
-    window = MainWindow()
+    window = MainWindow() # Creates/updates the database schema once (init_db) before reading settings
+    app.aboutToQuit.connect(db_manager.shutdown) # Runs after the final settings write in closeEvent
 
     # Determine initial UI mode (GUI or Hover Icon)
     if window.initial_mode == "hover":
@@ -1253,5 +1884,6 @@ if __name__ == '__main__':
         window.collapse_to_hover_icon()
     else:
         window.show()
+    QTimer.singleShot(0, window._finish_async_init) # Runs on the first event loop iteration
 
     sys.exit(app.exec())
@@ -1,9 +1,9 @@
 # context_generator.py
 # Handles the generation of context.txt content.
 
+import functools
 import os
 from pathlib import Path # For robust path manipulation
-import collections
 
 # Default names to ignore when generating the project tree summary.
 # The actual context.txt filename will be added to this list dynamically.
@@ -11,6 +11,58 @@ DEFAULT_TREE_IGNORED_NAMES = [
     '__pycache__', 'node_modules', 'target', 'build', '.venv', 'venv',
     '.git', 'dist', '.DS_Store'
 ]
+TREE_IGNORED_NAME_SET = frozenset(DEFAULT_TREE_IGNORED_NAMES) # For O(1) membership tests while walking
+
+def iter_project_files(root_dir):
+    """
+    Yields (normcased absolute path, file name) for every file below root_dir.
+    Uses os.scandir with an explicit stack, taking file/directory type from the directory
+    entries instead of a stat() per entry. Ignored and hidden directories are not descended
+    into, and symlinked directories are not followed (both as with os.walk).
+    Args:
+        root_dir (str): Directory to walk.
+    Yields:
+        tuple: (normcased absolute file path, original-case file name).
+    """
+    pending_dirs = [root_dir]
+    while pending_dirs:
+        current_dir = pending_dirs.pop()
+        try:
+            with os.scandir(current_dir) as entries:
+                for entry in entries:
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+                    if is_dir:
+                        if (not entry.is_symlink() and not entry.name.startswith('.')
+                                and entry.name not in TREE_IGNORED_NAME_SET):
+                            pending_dirs.append(entry.path)
+                    else:
+                        yield os.path.normcase(entry.path), entry.name
+        except OSError:
+            continue # Unreadable directory; skipped like os.walk does
+
+@functools.lru_cache(maxsize=256)
+def parse_file_types(file_types_str):
+    """
+    Splits a selection's comma-separated file types into extensions and exact filenames.
+    Cached per string, since the same few filters are applied to every file under a directory.
+    Args:
+        file_types_str (str): e.g. ".py,.js,Makefile"; entries starting with '.' are extensions.
+    Returns:
+        tuple: (tuple of lowercased extensions for str.endswith(), frozenset of normcased filenames).
+    """
+    allowed_extensions = []
+    exact_filenames_normcased = []
+    for ft_raw in file_types_str.split(','):
+        ft = ft_raw.strip()
+        if not ft: continue
+        if ft.startswith('.'): # Extension
+            allowed_extensions.append(ft.lower()) # Extensions are typically lowercase
+        else: # Exact filename
+            exact_filenames_normcased.append(os.path.normcase(ft))
+    return tuple(allowed_extensions), frozenset(exact_filenames_normcased)
 
 def generate_project_tree_summary(project_path, selections_for_summary, context_txt_leaf_name="context.txt"):
     """
@@ -94,21 +146,13 @@ def generate_project_tree_summary(project_path, selections_for_summary, context_
                     if file_types_str is None: # None means "ALL" files in this selected directory
                         return True 
                     
-                    allowed_extensions = []
-                    exact_filenames_normcased = []
-                    for ft_raw in file_types_str.split(','):
-                        ft = ft_raw.strip()
-                        if not ft: continue
-                        if ft.startswith('.'): # Extension
-                            allowed_extensions.append(ft.lower()) # Extensions are typically lowercase
-                        else: # Exact filename
-                            exact_filenames_normcased.append(os.path.normcase(ft))
+                    allowed_extensions, exact_filenames_normcased = parse_file_types(file_types_str)
                     
                     file_name_normcased = os.path.normcase(file_name_original_case)
                     
                     if file_name_normcased in exact_filenames_normcased:
                         return True
-                    if any(file_name_normcased.endswith(ext) for ext in allowed_extensions):
+                    if file_name_normcased.endswith(allowed_extensions):
                         return True
         return False
 
@@ -210,12 +254,13 @@ def generate_context_file_data(project_path, selections, binary_extensions, cont
     Args:
         project_path (str): The absolute path to the project's root directory (original case).
         selections (list): A list of selection dictionaries from the database (paths are normcased).
-        binary_extensions (list): A list of file extensions to treat as binary.
+        binary_extensions (iterable): File extensions to treat as binary.
         context_txt_leaf_name (str): The name of the context file being generated.
     Returns:
         list: A list of strings, where each string is a line for the context.txt file.
     """
     context_content_lines = []
+    binary_extensions = tuple(ext.lower() for ext in binary_extensions) # Matched with one endswith() call per file
     normalized_original_project_path = os.path.normpath(project_path)
     normcased_project_path = os.path.normcase(normalized_original_project_path)
     context_txt_abs_path_normcased = os.path.normcase(os.path.join(normalized_original_project_path, context_txt_leaf_name))
@@ -241,45 +286,35 @@ def generate_context_file_data(project_path, selections, binary_extensions, cont
             continue
 
         if sel['is_directory']:
-            allowed_extensions = []
-            exact_filenames_normcased = [] 
+            allowed_extensions, exact_filenames_normcased = (), frozenset()
             if sel['file_types']:
-                for ft_raw in sel['file_types'].split(','):
-                    ft = ft_raw.strip()
-                    if not ft: continue
-                    if ft.startswith('.'):
-                        allowed_extensions.append(ft.lower())
-                    else:
-                        exact_filenames_normcased.append(os.path.normcase(ft))
-
-            for root_normcased, dirs, files_original_case in os.walk(sel_path_normcased):
-                dirs[:] = [d for d in dirs if d not in DEFAULT_TREE_IGNORED_NAMES and not d.startswith('.')]
-                for file_name_original_case in files_original_case:
-                    full_file_path_abs_normcased = os.path.normcase(os.path.normpath(os.path.join(root_normcased, file_name_original_case)))
-                    file_name_normcased = os.path.normcase(file_name_original_case)
-
-                    if full_file_path_abs_normcased == context_txt_abs_path_normcased:
-                        continue
-
-                    include_file = False
-                    if not allowed_extensions and not exact_filenames_normcased: # No filters = include all
-                        include_file = True
-                    elif file_name_normcased in exact_filenames_normcased:
-                        include_file = True
-                    elif any(file_name_normcased.endswith(ext) for ext in allowed_extensions):
-                        include_file = True
-
-                    if include_file:
-                        display_path_for_header = full_file_path_abs_normcased 
-                        if full_file_path_abs_normcased.startswith(normcased_project_path + os.sep):
-                            try: # Attempt to reconstruct original-case relative path for display
-                                original_case_rel_path = os.path.relpath(full_file_path_abs_normcased.replace(normcased_project_path, normalized_original_project_path, 1), normalized_original_project_path)
-                                display_path_for_header = original_case_rel_path
-                            except ValueError: 
-                                 display_path_for_header = os.path.relpath(full_file_path_abs_normcased, normcased_project_path)
-                        elif sel_path_normcased != normcased_project_path : 
-                             display_path_for_header = f"EXTERNAL:{os.path.basename(full_file_path_abs_normcased)} (from {os.path.basename(sel_path_normcased)}{os.sep}...)"
-                        files_to_include[full_file_path_abs_normcased] = display_path_for_header
+                allowed_extensions, exact_filenames_normcased = parse_file_types(sel['file_types'])
+
+            for full_file_path_abs_normcased, file_name_original_case in iter_project_files(sel_path_normcased):
+                file_name_normcased = os.path.normcase(file_name_original_case)
+
+                if full_file_path_abs_normcased == context_txt_abs_path_normcased:
+                    continue
+
+                include_file = False
+                if not allowed_extensions and not exact_filenames_normcased: # No filters = include all
+                    include_file = True
+                elif file_name_normcased in exact_filenames_normcased:
+                    include_file = True
+                elif file_name_normcased.endswith(allowed_extensions):
+                    include_file = True
+
+                if include_file:
+                    display_path_for_header = full_file_path_abs_normcased 
+                    if full_file_path_abs_normcased.startswith(normcased_project_path + os.sep):
+                        try: # Attempt to reconstruct original-case relative path for display
+                            original_case_rel_path = os.path.relpath(full_file_path_abs_normcased.replace(normcased_project_path, normalized_original_project_path, 1), normalized_original_project_path)
+                            display_path_for_header = original_case_rel_path
+                        except ValueError: 
+                             display_path_for_header = os.path.relpath(full_file_path_abs_normcased, normcased_project_path)
+                    elif sel_path_normcased != normcased_project_path : 
+                         display_path_for_header = f"EXTERNAL:{os.path.basename(full_file_path_abs_normcased)} (from {os.path.basename(sel_path_normcased)}{os.sep}...)"
+                    files_to_include[full_file_path_abs_normcased] = display_path_for_header
         else:  # Single file selection
             if sel_path_normcased == context_txt_abs_path_normcased:
                 continue
@@ -300,7 +335,7 @@ def generate_context_file_data(project_path, selections, binary_extensions, cont
     for file_path_abs_normcased in sorted_file_paths_abs_normcased:
         display_rel_path_for_header = files_to_include[file_path_abs_normcased]
         try:
-            is_binary = any(file_path_abs_normcased.endswith(ext.lower()) for ext in binary_extensions)
+            is_binary = file_path_abs_normcased.lower().endswith(binary_extensions)
             if not is_binary:
                 try:
                     with open(file_path_abs_normcased, 'rb') as f_check:
@@ -1,7 +1,33 @@
 import sqlite3
 import os
+import atexit
+import threading
+from contextlib import contextmanager
 
 DATABASE_NAME = 'context_dropper.db'
+# Resolved once at import; CONTEXTDROPPER_DB overrides the default file in the current working directory
+DATABASE_PATH = os.path.abspath(os.environ.get("CONTEXTDROPPER_DB", DATABASE_NAME))
+os.makedirs(os.path.dirname(DATABASE_PATH), exist_ok=True)
+
+# A single connection is shared for the lifetime of the process instead of
+# reconnecting (and reloading the schema) on every call. The lock serializes
+# access to it from the GUI thread and background workers.
+_CONN = None
+_LOCK = threading.RLock()
+_batch_depth = 0 # > 0 while inside batch(); guarded by _LOCK
+
+# PRAGMAs applied each time the shared connection is opened.
+# auto_vacuum only takes effect on a freshly created database (or after a VACUUM).
+SQLITE_PRAGMAS = {
+    "mmap_size": 268435456, # Read pages through a 256 MB memory map instead of read() calls
+    "auto_vacuum": "INCREMENTAL",
+    "journal_mode": "WAL", # Commits append to the write-ahead log instead of rewriting the main file
+    "synchronous": "NORMAL", # With WAL, fsync only at checkpoints rather than on every commit
+    "temp_store": "MEMORY", # Temporary tables and sort spills stay in RAM
+}
+
+# Stored in PRAGMA user_version once _create_tables() has run; bump when the schema changes
+SCHEMA_VERSION = 1
 
 # Default AI prompt guide for new projects
 DEFAULT_NEW_PROJECT_PROMPT = """[2-4 Sentence description of this project goes here]
@@ -9,14 +35,107 @@ I need your help with the following task progressing this project forwards. When
 My question is:"""
 
 def get_db_connection():
-    """Establishes a connection to the SQLite database."""
-    conn = sqlite3.connect(DATABASE_NAME)
-    conn.row_factory = sqlite3.Row # Access columns by name
-    return conn
+    """Returns the shared connection to the SQLite database, opening it on first use."""
+    global _CONN
+    with _LOCK:
+        if _CONN is None:
+            _CONN = sqlite3.connect(DATABASE_PATH, check_same_thread=False)
+            _CONN.row_factory = sqlite3.Row # Access columns by name
+            for pragma, value in SQLITE_PRAGMAS.items():
+                _CONN.execute(f"PRAGMA {pragma} = {value}")
+        return _CONN
+
+def close_db_connection():
+    """Closes the shared connection. A later call to get_db_connection() reopens it."""
+    global _CONN
+    with _LOCK:
+        if _CONN is not None:
+            _CONN.close()
+            _CONN = None
+
+atexit.register(close_db_connection)
+
+def shutdown():
+    """
+    Tidies up the database file and closes the shared connection.
+    Intended to be called once when the application quits, so the next startup
+    opens a compact file with fresh query planner statistics.
+    """
+    with _LOCK:
+        if _CONN is None:
+            return
+        try:
+            _CONN.execute("PRAGMA optimize")
+            if _CONN.execute("PRAGMA auto_vacuum").fetchone()[0] == 2: # INCREMENTAL; files created before it stay 0
+                _CONN.executescript("PRAGMA incremental_vacuum;") # Steps to completion; execute() frees a single page
+            _CONN.execute("PRAGMA wal_checkpoint(TRUNCATE)") # No-op unless the database is in WAL mode
+        except sqlite3.Error as e:
+            print(f"Error during database shutdown maintenance: {e}")
+        close_db_connection()
+
+@contextmanager
+def _locked_connection():
+    """Yields the shared connection while holding the lock that guards it."""
+    with _LOCK:
+        yield get_db_connection()
+
+def _commit(conn):
+    """Commits the current transaction, unless it is part of an enclosing batch()."""
+    if _batch_depth == 0:
+        conn.commit()
+
+def _rollback(conn):
+    """
+    Rolls back after a failed write. Must be called from an except block: inside batch() it
+    re-raises the error being handled instead, so batch() rolls back every write of the batch
+    rather than this one silently discarding the earlier ones.
+    """
+    if _batch_depth > 0:
+        raise
+    conn.rollback()
+
+@contextmanager
+def batch():
+    """
+    Groups the writes made inside the block into one transaction (a single commit and fsync).
+    Nested batches join the outermost one. Any exception rolls the whole batch back; database
+    errors are then reported like the single-write helpers do, other exceptions propagate.
+    """
+    global _batch_depth
+    with _locked_connection() as conn:
+        _batch_depth += 1
+        try:
+            yield conn
+        except sqlite3.Error as e:
+            _batch_depth -= 1
+            if _batch_depth > 0:
+                raise # Reported by the outermost batch
+            conn.rollback()
+            print(f"Error in batched database write, all of its changes were rolled back: {e}")
+            return
+        except Exception:
+            _batch_depth -= 1
+            if _batch_depth == 0:
+                conn.rollback()
+            raise
+        _batch_depth -= 1
+        if _batch_depth == 0:
+            conn.commit()
 
 def init_db():
-    """Initializes the database with necessary tables if they don't exist."""
-    conn = get_db_connection()
+    """
+    Initializes the database with necessary tables if they don't exist.
+    A database already stamped with the current SCHEMA_VERSION is left untouched,
+    so a normal startup costs a single PRAGMA read instead of the full schema pass.
+    """
+    with _locked_connection() as conn:
+        if conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION:
+            return
+        _create_tables(conn)
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    # print(f"Database '{DATABASE_NAME}' initialized with updated schema (selections.path COLLATE NOCASE).")
+
+def _create_tables(conn):
     cursor = conn.cursor()
 
     # Projects table
@@ -64,28 +183,38 @@ def init_db():
             value TEXT
         )
     ''')
-    conn.commit()
-    conn.close()
-    # print(f"Database '{DATABASE_NAME}' initialized with updated schema (selections.path COLLATE NOCASE).")
+    _commit(conn)
 
 # --- App Settings Functions ---
 def get_app_setting(key):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT value FROM app_settings WHERE key = ?", (key,))
-    row = cursor.fetchone()
-    conn.close()
+    with _locked_connection() as conn:
+        row = conn.execute("SELECT value FROM app_settings WHERE key = ?", (key,)).fetchone()
     return row['value'] if row else None
 
 def set_app_setting(key, value):
-    conn = get_db_connection()
-    try:
-        conn.execute("INSERT OR REPLACE INTO app_settings (key, value) VALUES (?, ?)", (key, value))
-        conn.commit()
-    except sqlite3.Error as e:
-        print(f"Error setting app setting {key}: {e}")
-    finally:
-        conn.close()
+    with _locked_connection() as conn:
+        try:
+            conn.execute("INSERT OR REPLACE INTO app_settings (key, value) VALUES (?, ?)", (key, value))
+            _commit(conn)
+        except sqlite3.Error as e:
+            print(f"Error setting app setting {key}: {e}")
+            _rollback(conn)
+
+def set_app_settings(settings):
+    """
+    Stores several app settings in a single transaction.
+    Args:
+        settings (dict): Mapping of setting keys to their (string) values.
+    """
+    if not settings:
+        return
+    with _locked_connection() as conn:
+        try:
+            conn.executemany("INSERT OR REPLACE INTO app_settings (key, value) VALUES (?, ?)", list(settings.items()))
+            _commit(conn)
+        except sqlite3.Error as e:
+            print(f"Error setting app settings {list(settings)}: {e}")
+            _rollback(conn)
 
 # --- Project Functions ---
 def add_project(name, path, prompt_guide=DEFAULT_NEW_PROJECT_PROMPT):
@@ -99,122 +228,104 @@ def add_project(name, path, prompt_guide=DEFAULT_NEW_PROJECT_PROMPT):
     Returns:
         int or None: The ID of the newly created project, or None if an error occurred.
     """
-    conn = get_db_connection()
-    try:
-        # Store the original path for projects, normcasing is mainly for selections uniqueness/lookup
-        # However, for consistency in how project paths are handled if they were ever used in complex lookups,
-        # normcasing here too might be safer, but for display, original is often preferred.
-        # For now, let's keep project.path as original, as it's mostly for display and setting root.
-        # If we find issues, we can normcase project.path as well.
-        conn.execute("INSERT INTO projects (name, path, prompt_guide) VALUES (?, ?, ?)",
-                     (name, os.path.normpath(path), prompt_guide)) # normpath for cleanup
-        conn.commit()
-        return conn.execute("SELECT last_insert_rowid()").fetchone()[0]
-    except sqlite3.IntegrityError:
-        # print(f"Project with name '{name}' already exists.")
-        return None
-    finally:
-        conn.close()
+    with _locked_connection() as conn:
+        try:
+            # Store the original path for projects, normcasing is mainly for selections uniqueness/lookup
+            # However, for consistency in how project paths are handled if they were ever used in complex lookups,
+            # normcasing here too might be safer, but for display, original is often preferred.
+            # For now, let's keep project.path as original, as it's mostly for display and setting root.
+            # If we find issues, we can normcase project.path as well.
+            conn.execute("INSERT INTO projects (name, path, prompt_guide) VALUES (?, ?, ?)",
+                         (name, os.path.normpath(path), prompt_guide)) # normpath for cleanup
+            _commit(conn)
+            return conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+        except sqlite3.IntegrityError:
+            # print(f"Project with name '{name}' already exists.")
+            _rollback(conn)
+            return None
 
 def get_projects():
-    conn = get_db_connection()
-    projects = conn.execute("SELECT * FROM projects ORDER BY name").fetchall()
-    conn.close()
-    return projects
+    with _locked_connection() as conn:
+        return conn.execute("SELECT * FROM projects ORDER BY name").fetchall()
 
 def get_project_by_id(project_id):
-    conn = get_db_connection()
-    project = conn.execute("SELECT * FROM projects WHERE id = ?", (project_id,)).fetchone()
-    conn.close()
-    return project
+    with _locked_connection() as conn:
+        return conn.execute("SELECT * FROM projects WHERE id = ?", (project_id,)).fetchone()
 
 def get_active_project():
-    conn = get_db_connection()
-    project = conn.execute("SELECT * FROM projects WHERE is_active = 1").fetchone()
-    conn.close()
-    return project
+    with _locked_connection() as conn:
+        return conn.execute("SELECT * FROM projects WHERE is_active = 1").fetchone()
 
 def set_active_project(project_id):
-    conn = get_db_connection()
-    conn.execute("UPDATE projects SET is_active = 0")
-    if project_id:
-        conn.execute("UPDATE projects SET is_active = 1 WHERE id = ?", (project_id,))
-    conn.commit()
-    conn.close()
+    with _locked_connection() as conn:
+        conn.execute("UPDATE projects SET is_active = 0")
+        if project_id:
+            conn.execute("UPDATE projects SET is_active = 1 WHERE id = ?", (project_id,))
+        _commit(conn)
 
 def update_project_prompt(project_id, prompt_guide):
-    conn = get_db_connection()
-    conn.execute("UPDATE projects SET prompt_guide = ? WHERE id = ?", (prompt_guide, project_id))
-    conn.commit()
-    conn.close()
+    with _locked_connection() as conn:
+        conn.execute("UPDATE projects SET prompt_guide = ? WHERE id = ?", (prompt_guide, project_id))
+        _commit(conn)
 
 def delete_project(project_id):
-    conn = get_db_connection()
-    conn.execute("DELETE FROM projects WHERE id = ?", (project_id,))
-    conn.commit()
-    conn.close()
+    with _locked_connection() as conn:
+        conn.execute("DELETE FROM projects WHERE id = ?", (project_id,))
+        _commit(conn)
 
 
 # --- Category Functions ---
 def add_category(project_id, name):
-    conn = get_db_connection()
-    try:
-        conn.execute("INSERT INTO categories (project_id, name) VALUES (?, ?)", (project_id, name))
-        conn.commit()
-        return conn.execute("SELECT last_insert_rowid()").fetchone()[0]
-    except sqlite3.IntegrityError:
-        # print(f"Category '{name}' already exists for this project.")
-        return None
-    finally:
-        conn.close()
+    with _locked_connection() as conn:
+        try:
+            conn.execute("INSERT INTO categories (project_id, name) VALUES (?, ?)", (project_id, name))
+            _commit(conn)
+            return conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+        except sqlite3.IntegrityError:
+            # print(f"Category '{name}' already exists for this project.")
+            _rollback(conn)
+            return None
 
 def get_categories(project_id):
-    conn = get_db_connection()
-    categories = conn.execute("SELECT * FROM categories WHERE project_id = ? ORDER BY name", (project_id,)).fetchall()
-    conn.close()
-    return categories
+    with _locked_connection() as conn:
+        return conn.execute("SELECT * FROM categories WHERE project_id = ? ORDER BY name", (project_id,)).fetchall()
 
 def remove_category_and_uncategorize_items(category_id):
-    conn = get_db_connection()
-    try:
-        conn.execute("UPDATE selections SET category_id = NULL WHERE category_id = ?", (category_id,))
-        conn.execute("DELETE FROM categories WHERE id = ?", (category_id,))
-        conn.commit()
-        return True
-    except sqlite3.Error as e:
-        print(f"Error removing category {category_id} and uncategorizing items: {e}")
-        conn.rollback()
-        return False
-    finally:
-        conn.close()
+    with _locked_connection() as conn:
+        try:
+            conn.execute("UPDATE selections SET category_id = NULL WHERE category_id = ?", (category_id,))
+            conn.execute("DELETE FROM categories WHERE id = ?", (category_id,))
+            _commit(conn)
+            return True
+        except sqlite3.Error as e:
+            print(f"Error removing category {category_id} and uncategorizing items: {e}")
+            _rollback(conn)
+            return False
 
 # --- Selection Functions ---
 def add_selection(project_id, path, is_directory, category_id=None, file_types=None):
-    conn = get_db_connection()
     # Path is already normcased by the caller (MainWindow) before being passed here.
     # And the table column `selections.path` is `COLLATE NOCASE`.
     # So, direct insertion of the (already normcased) path is fine.
     # os.path.normpath is still good for cleaning slashes, etc.
     clean_path = os.path.normpath(path) # Path is already normcased by caller
     # print(f"# DB_DEBUG: add_selection - ProjID={project_id}, Path='{clean_path}', IsDir={is_directory}")
-    try:
-        conn.execute("""
-            INSERT INTO selections (project_id, path, is_directory, category_id, file_types)
-            VALUES (?, ?, ?, ?, ?)
-        """, (project_id, clean_path, is_directory, category_id, file_types))
-        conn.commit()
-    except sqlite3.IntegrityError:
-        conn.execute("""
-            UPDATE selections SET category_id = ?, file_types = ?, is_directory = ?
-            WHERE project_id = ? AND path = ? 
-        """, (category_id, file_types, is_directory, project_id, clean_path)) # Path comparison will be case-insensitive
-        conn.commit()
-        # print(f"# DB_DEBUG: Updated selection: ProjID={project_id}, Path='{clean_path}'")
-    finally:
-        conn.close()
+    with _locked_connection() as conn:
+        try:
+            conn.execute("""
+                INSERT INTO selections (project_id, path, is_directory, category_id, file_types)
+                VALUES (?, ?, ?, ?, ?)
+            """, (project_id, clean_path, is_directory, category_id, file_types))
+            _commit(conn)
+        except sqlite3.IntegrityError:
+            conn.execute("""
+                UPDATE selections SET category_id = ?, file_types = ?, is_directory = ?
+                WHERE project_id = ? AND path = ? 
+            """, (category_id, file_types, is_directory, project_id, clean_path)) # Path comparison will be case-insensitive
+            _commit(conn)
+            # print(f"# DB_DEBUG: Updated selection: ProjID={project_id}, Path='{clean_path}'")
 
 def get_selections(project_id, category_id=None):
-    conn = get_db_connection()
     query = """
         SELECT s.id, s.project_id, s.path, s.is_directory, s.category_id, s.file_types, c.name as category_name
         FROM selections s
@@ -226,34 +337,30 @@ def get_selections(project_id, category_id=None):
         query += " AND s.category_id = ?"
         params.append(category_id)
     # Paths retrieved will be as stored; comparison in WHERE clause is case-insensitive.
-    selections = conn.execute(query, params).fetchall()
-    conn.close()
-    return selections
+    with _locked_connection() as conn:
+        return conn.execute(query, params).fetchall()
 
 def get_selection_by_path(project_id, path):
-    conn = get_db_connection()
     # Path is already normcased by the caller.
     # The WHERE path = ? comparison will be case-insensitive due to COLLATE NOCASE.
     clean_path = os.path.normpath(path)
     # print(f"# DB_DEBUG: get_selection_by_path - Querying ProjID={project_id}, Path='{clean_path}'")
-    selection = conn.execute("SELECT * FROM selections WHERE project_id = ? AND path = ?", (project_id, clean_path)).fetchone()
-    conn.close()
-    return selection
+    with _locked_connection() as conn:
+        return conn.execute("SELECT * FROM selections WHERE project_id = ? AND path = ?", (project_id, clean_path)).fetchone()
 
 def remove_selection(project_id, path):
-    conn = get_db_connection()
     # Path is already normcased by the caller.
     # The WHERE path = ? comparison will be case-insensitive.
     clean_path = os.path.normpath(path)
     # print(f"# DB_DEBUG: remove_selection - Removing ProjID={project_id}, Path='{clean_path}'")
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM selections WHERE project_id = ? AND path = ?", (project_id, clean_path))
-    conn.commit()
-    # if cursor.rowcount > 0:
-        # print(f"# DB_DEBUG: Successfully removed {cursor.rowcount} row(s) for path '{clean_path}'")
-    # else:
-        # print(f"# DB_DEBUG: No rows removed for path '{clean_path}'. It might not exist or case mismatch (pre-COLLATE NOCASE data).")
-    conn.close()
+    with _locked_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM selections WHERE project_id = ? AND path = ?", (project_id, clean_path))
+        _commit(conn)
+        # if cursor.rowcount > 0:
+            # print(f"# DB_DEBUG: Successfully removed {cursor.rowcount} row(s) for path '{clean_path}'")
+        # else:
+            # print(f"# DB_DEBUG: No rows removed for path '{clean_path}'. It might not exist or case mismatch (pre-COLLATE NOCASE data).")
 
 def update_selection_category(project_id, path, category_id):
     """
@@ -263,26 +370,24 @@ def update_selection_category(project_id, path, category_id):
         path (str): The normcased path of the selection.
         category_id (int or None): The new category ID, or None to uncategorize.
     """
-    conn = get_db_connection()
     # Path is already normcased by the caller.
     clean_path = os.path.normpath(path)
     # print(f"# DB_DEBUG: update_selection_category - Updating ProjID={project_id}, Path='{clean_path}', CatID={category_id}")
-    try:
-        # The SQL statement requires 3 placeholders: category_id, project_id, path
-        # The parameters should be in the order: (new_category_id, project_id_for_where, path_for_where)
-        conn.execute("UPDATE selections SET category_id = ? WHERE project_id = ? AND path = ?",
-                     (category_id, project_id, clean_path)) # Corrected parameter order and count
-        conn.commit()
-        # print(f"# DB_DEBUG: Successfully updated category for path '{clean_path}'")
-    except sqlite3.Error as e:
-        print(f"Error updating selection category for path '{clean_path}': {e}")
-        conn.rollback() # Rollback on error
-    finally:
-        conn.close()
+    with _locked_connection() as conn:
+        try:
+            # The SQL statement requires 3 placeholders: category_id, project_id, path
+            # The parameters should be in the order: (new_category_id, project_id_for_where, path_for_where)
+            conn.execute("UPDATE selections SET category_id = ? WHERE project_id = ? AND path = ?",
+                         (category_id, project_id, clean_path)) # Corrected parameter order and count
+            _commit(conn)
+            # print(f"# DB_DEBUG: Successfully updated category for path '{clean_path}'")
+        except sqlite3.Error as e:
+            print(f"Error updating selection category for path '{clean_path}': {e}")
+            _rollback(conn)
 
 if __name__ == '__main__':
-    if not os.path.exists(DATABASE_NAME):
-        print(f"Database '{DATABASE_NAME}' not found. Initializing with new schema...")
+    if not os.path.exists(DATABASE_PATH):
+        print(f"Database '{DATABASE_PATH}' not found. Initializing with new schema...")
         init_db()
     else:
         # print(f"Database '{DATABASE_NAME}' already exists. Ensuring schema is up-to-date...")
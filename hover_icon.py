@@ -1,8 +1,5 @@
 import sys
 import os
-import shutil
-import collections
-from pathlib import Path
 import random
 import math
 
@@ -10,7 +7,6 @@ from PySide6.QtWidgets import (
     QApplication,
     QWidget,
     QPushButton,
-    QLabel,
 )
 from PySide6.QtGui import (
     QPainter,
@@ -204,7 +200,8 @@ class _ConfettiOverlay(QWidget):
         p.end()
 
     def closeEvent(self, event):
-        if self._parent_icon and hasattr(self._parent_icon, "_confetti_overlay"):
+        # HoverIcon always defines _confetti_overlay; only clear it if it still refers to this overlay
+        if self._parent_icon is not None and self._parent_icon._confetti_overlay is self:
             self._parent_icon._confetti_overlay = None
         super().closeEvent(event)
 
@@ -213,6 +210,7 @@ class HoverIcon(QWidget):
     drop_context_requested = Signal()
     maximize_requested = Signal(object) # object will be QScreen
     close_application_requested = Signal()
+    position_changed = Signal() # Emitted after the user drags the icon to a new position
 
     DRAG_THRESHOLD = 5
     LONG_PRESS_DURATION = 300 # ms for long press to initiate drag
@@ -317,8 +315,10 @@ class HoverIcon(QWidget):
         if db_manager:
             try:
                 current_pos = self.pos()
-                db_manager.set_app_setting(HOVER_POS_X_KEY, str(current_pos.x()))
-                db_manager.set_app_setting(HOVER_POS_Y_KEY, str(current_pos.y()))
+                db_manager.set_app_settings({ # Both coordinates in one transaction
+                    HOVER_POS_X_KEY: str(current_pos.x()),
+                    HOVER_POS_Y_KEY: str(current_pos.y()),
+                })
             except Exception as e:
                 print(f"HoverIcon: Error saving position: {e}")
 
@@ -428,7 +428,7 @@ class HoverIcon(QWidget):
             QApplication.restoreOverrideCursor() # Always restore cursor
 
             if was_dragging:
-                self.save_current_position()
+                self.position_changed.emit() # The owner persists it, batched with its other settings
                 # After drag, cursor might be anywhere. Re-evaluate button visibility.
                 self._update_button_visibility_on_mouse_hover() 
                 event.accept()
@@ -524,13 +524,14 @@ if __name__ == "__main__":
     app = QApplication(sys.argv)
 
     if db_manager:
-        if not os.path.exists(db_manager.DATABASE_NAME):
-            print(f"Database '{db_manager.DATABASE_NAME}' not found for HoverIcon test. Initializing...")
+        if not os.path.exists(db_manager.DATABASE_PATH):
+            print(f"Database '{db_manager.DATABASE_PATH}' not found for HoverIcon test. Initializing...")
             db_manager.init_db()
         else:
             db_manager.init_db() # Ensure tables exist
 
     icon = HoverIcon()
+    icon.position_changed.connect(icon.save_current_position) # No MainWindow to batch the write in this test
 
     if db_manager:
         try:
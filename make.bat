@@ -1,2 +1,3 @@
+pyside6-rcc resources.qrc -o resources_rc.py
 python -m PyInstaller --onefile --windowed --icon=contextdropper.ico context_dropper.py
-copy .\dist\context_dropper.exe .
\ No newline at end of file
+copy .\dist\context_dropper.exe .
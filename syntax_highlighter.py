@@ -1,5 +1,5 @@
 from PySide6.QtGui import QSyntaxHighlighter, QTextCharFormat, QColor, QFont
-from PySide6.QtCore import QRegularExpression, Qt
+from PySide6.QtCore import QRegularExpression
 
 # --- Color and Style Definitions ---
 # Using common VSCode-like colors
@@ -282,28 +282,50 @@ HIGHLIGHTER_CONFIGS = {
     '.kt': {'rules': KOTLIN_RULES, 'multiline_delimiters': KOTLIN_MULTILINE_DELIMITERS},
 }
 
-class SyntaxHighlighter(QSyntaxHighlighter):
-    def __init__(self, document, language_ext):
-        super().__init__(document)
-        lang_config = HIGHLIGHTER_CONFIGS.get(language_ext.lower())
-        
-        self.rules = []
-        self.multiline_delimiters = {}
+# Compiled QRegularExpression rules per extension, shared by all highlighter instances
+_COMPILED_RULES_CACHE = {}
 
+def _compiled_rules_for(language_ext):
+    """
+    Returns the compiled highlighting rules for a (lowercase) file extension,
+    compiling the patterns only the first time an extension is highlighted.
+    """
+    rules = _COMPILED_RULES_CACHE.get(language_ext)
+    if rules is None:
+        rules = []
+        lang_config = HIGHLIGHTER_CONFIGS.get(language_ext)
         if lang_config:
             for pattern_str, style_format, *nth_group_opt in lang_config.get('rules', []):
                 nth_group = nth_group_opt[0] if nth_group_opt else 0
-                self.rules.append({
+                rules.append({
                     'pattern': QRegularExpression(pattern_str),
                     'format': style_format,
                     'nth_group': nth_group
                 })
-            self.multiline_delimiters = lang_config.get('multiline_delimiters', {})
+        _COMPILED_RULES_CACHE[language_ext] = rules
+    return rules
+
+class SyntaxHighlighter(QSyntaxHighlighter):
+    def __init__(self, document, language_ext):
+        super().__init__(document)
+        self.rules = []
+        self.multiline_delimiters = {}
+        self.set_language(language_ext)
         
         # Ensure all state IDs are unique if multiple delimiter types exist per language
         # This is a basic check; more robust ID generation might be needed for complex cases
         # For now, the state_ids are manually assigned and assumed unique across a language.
 
+    def set_language(self, language_ext):
+        """
+        Switches the rules used for highlighting, so one instance can be reused across documents.
+        Call before setDocument(), which triggers the rehighlight.
+        """
+        language_ext = language_ext.lower()
+        lang_config = HIGHLIGHTER_CONFIGS.get(language_ext)
+        self.rules = _compiled_rules_for(language_ext)
+        self.multiline_delimiters = lang_config.get('multiline_delimiters', {}) if lang_config else {}
+
     def highlightBlock(self, text):
         current_block_state_id = self.previousBlockState()
         active_delimiter_key = None
@@ -7,7 +7,7 @@ from PySide6.QtWidgets import (
     QPushButton, QDialogButtonBox, QMessageBox, QListWidgetItem,
     QWidget, QLabel, QGraphicsOpacityEffect
 )
-from PySide6.QtCore import Qt, Signal, QTimer, QPropertyAnimation, QEasingCurve, QPoint, QRect
+from PySide6.QtCore import Qt, Signal, QTimer, QPropertyAnimation, QEasingCurve, QRect
 from PySide6.QtGui import QGuiApplication # For NotificationWidget positioning
 
 import db_manager # Required for ManageCategoriesDialog
@@ -52,6 +52,16 @@ class ManageCategoriesDialog(QDialog):
         # dialog_buttons.rejected.connect(self.reject) # QDialog has reject by default with Escape key
         layout.addWidget(dialog_buttons)
 
+    def reset(self, project_id):
+        """
+        Prepares a reused dialog to be shown again, for the given project.
+        Args:
+            project_id (int): The project whose categories the dialog manages.
+        """
+        self.project_id = project_id
+        self.new_category_edit.clear()
+        self.load_categories()
+
     def load_categories(self):
         """
         Loads categories for the current project_id into the list widget.